@@ -0,0 +1,73 @@
+"""
+Batch runner for RPAL programs.
+
+Runs many programs in one invocation of the interpreter. The programs are
+distributed over a pool of worker processes, the output of every program is
+captured separately, and the results are printed in the order of the input
+together with the time each program took.
+"""
+
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+from errors import RPALError
+from interpreter import Interpreter
+from pipeline import Pipeline
+
+
+# The following function collects the programs in a directory, or listed one per line in a file.
+def collect_programs(target):
+    if os.path.isdir(target):
+        return [os.path.join(target, name) for name in sorted(os.listdir(target))
+                if os.path.isfile(os.path.join(target, name)) and not name.startswith(".")]
+
+    directory = os.path.dirname(target)
+    with open(target, "r") as file:
+        lines = [line.strip() for line in file]
+    # Relative paths in a list are relative to the list itself.
+    return [os.path.join(directory, line) for line in lines if line and not line.startswith("#")]
+
+
+# The following function runs one program in a worker and returns its output, exit status and time.
+# Everything the program prints, including error messages, is captured in its own buffer.
+def run_program(task):
+    filename, engine, use_cache = task
+    output = io.StringIO()
+    status = 0
+    start = time.perf_counter()
+    with redirect_stdout(output):
+        try:
+            Interpreter(engine).execute(Pipeline(filename, use_cache))
+        except RPALError:
+            # The interpreter has already written the error to the output.
+            status = 1
+        except Exception as e:
+            print(f"Error executing program: {e}")
+            status = 1
+    return filename, output.getvalue(), status, time.perf_counter() - start
+
+
+# The following function runs the programs and prints their results in the order they were given.
+# It returns the number of programs that failed.
+def run_batch(filenames, engine="cse", use_cache=True, jobs=None, stream=None):
+    stream = stream or sys.stdout
+    tasks = [(filename, engine, use_cache) for filename in filenames]
+    failures = 0
+    start = time.perf_counter()
+
+    with Pool(jobs) as pool:
+        # imap returns the results in the order of the tasks while the workers run ahead.
+        for filename, output, status, elapsed in pool.imap(run_program, tasks):
+            result = "ok" if status == 0 else f"exit status {status}"
+            print(f"==> {filename} ({elapsed:.3f} s, {result})", file=stream)
+            stream.write(output)
+            if output and not output.endswith("\n"):
+                stream.write("\n")
+            failures += status != 0
+
+    elapsed = time.perf_counter() - start
+    print(f"{len(filenames)} programs, {failures} failed, {elapsed:.3f} s", file=stream)
+    return failures
@@ -0,0 +1,814 @@
+"""
+RPAL Interpreter Benchmarks
+Usage: python benchmark.py [benchmark ...]
+
+Each benchmark generates RPAL programs, runs them through the interpreter and
+prints the timings. Run without arguments to list the available benchmarks.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PYTHON = sys.executable
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(ROOT, "myrpal.py")
+
+
+# The following function writes an RPAL program to a temporary file and returns its path.
+def write_program(source):
+    handle, path = tempfile.mkstemp(suffix=".rpal", text=True)
+    with os.fdopen(handle, "w") as file:
+        file.write(source)
+    return path
+
+
+# The following function runs the interpreter on a program and returns the elapsed time.
+# Every benchmark but bench_cache runs with --no-cache, so it times the whole front end and leaves no cache entries.
+def time_program(source, *switches):
+    path = write_program(source)
+    try:
+        start = time.perf_counter()
+        subprocess.run([PYTHON, APP, "--no-cache", *switches, path], check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - start
+    finally:
+        os.remove(path)
+
+
+# A program that makes `calls` function calls while `scope` other variables are visible.
+def scope_program(scope, calls):
+    names = " and ".join(f"v{i} = {i}" for i in range(scope))
+    return (
+        f"let {names} in\n"
+        f"let rec loop n = n eq 0 -> 0 | loop (n - 1)\n"
+        f"in Print (loop {calls})\n"
+    )
+
+
+def bench_scope():
+    """Function call cost as the number of visible bindings grows."""
+    calls = 2000
+    print(f"{'scope':>8} {'time (s)':>10} {'per call (us)':>14}")
+    for scope in (1, 10, 100, 1000):
+        # Subtract the cost of running the same program without the calls.
+        empty = time_program(scope_program(scope, 0))
+        elapsed = time_program(scope_program(scope, calls))
+        per_call = (elapsed - empty) / calls * 1e6
+        print(f"{scope:>8} {elapsed:>10.3f} {per_call:>14.2f}")
+
+
+# The following function runs the interpreter with --mem-stats and returns the report lines.
+def memory_report(source):
+    path = write_program(source)
+    try:
+        result = subprocess.run([PYTHON, APP, "--mem-stats", "--no-cache", path], check=True,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        return dict(line.split(": ") for line in result.stderr.splitlines())
+    finally:
+        os.remove(path)
+
+
+def bench_environments():
+    """Peak live environments for programs making many independent calls."""
+    print(f"{'calls':>8} {'created':>10} {'peak live':>10}")
+    for calls in (10, 100, 1000):
+        items = ", ".join(f"square {i}" for i in range(calls))
+        report = memory_report(f"let square x = x * x in Print (Order ({items}))\n")
+        print(f"{calls:>8} {report['Environments created']:>10} {report['Peak live environments']:>10}")
+
+
+def bench_recursion():
+    """Function return cost as recursion depth and pending stack values grow."""
+    print(f"{'depth':>8} {'deep (us/call)':>15} {'wide (us/call)':>15}")
+    for depth in (500, 1000, 2000, 4000):
+        # A chain of nested calls, each returning into the previous one.
+        deep = "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in Print (f {})\n"
+        # Many calls whose results stay on the stack until the tuple is complete.
+        calls = ", ".join(f"f {i}" for i in range(depth))
+        wide = f"let f n = n + 1 in Print (Order ({calls}))\n"
+
+        empty = time_program(deep.format(0))
+        deep_time = (time_program(deep.format(depth)) - empty) / depth * 1e6
+        empty = time_program(f"let f n = n + 1 in Print (Order ({', '.join(['0'] * depth)}))\n")
+        wide_time = (time_program(wide) - empty) / depth * 1e6
+        print(f"{depth:>8} {deep_time:>15.2f} {wide_time:>15.2f}")
+
+
+# The environment of the CSE machine before frames: a dictionary of names with a link to the parent
+# environment. It is kept here as the baseline for bench_symbols and bench_addressing.
+class Environment():
+    def __init__(self, number, parent):
+        self.name = "e_" + str(number)
+        self.parent = parent
+        self.variables = {}
+
+    def __repr__(self):
+        return self.name
+
+    def add_variable(self, key, value):
+        self.variables[key] = value
+
+    # This function finds the value bound to a variable by following the parent links.
+    def lookup(self, key):
+        environment = self
+        while environment is not None:
+            variables = environment.variables
+            if key in variables:
+                return variables[key]
+            environment = environment.parent
+        raise KeyError(key)
+
+
+# The string parsing the CSE machine did for every control symbol before the control
+# structures held pre-resolved instructions. It is kept here as the baseline for bench_symbols.
+def legacy_lookup(name, environment, built_in_functions):
+    name = name[1:-1]
+    info = name.split(":")
+    if len(info) == 1:
+        value = info[0]
+    else:
+        data_type, value = info[0], info[1]
+        if data_type == "INT":
+            return int(value)
+        elif data_type == "STR":
+            return value.strip("'")
+        elif data_type == "ID":
+            if value in built_in_functions:
+                return value
+            return environment.lookup(value)
+    if value == "nil":
+        return ()
+    return value == "true"
+
+
+def bench_symbols():
+    """Resolving control symbols of Q6: string parsing against pre-resolved instructions."""
+    import csemachine
+    from pipeline import Pipeline
+    from structures import Identifier
+
+    st = Pipeline(os.path.join(ROOT, "test_files", "Q6.txt")).st
+
+    # Collect the leaves of the standardized tree, which are the symbols looked up at run time.
+    names = []
+    nodes = [st]
+    while nodes:
+        node = nodes.pop()
+        if node.value.startswith("<") and node.value != "<Y*>":
+            names.append(node.value)
+        nodes.extend(node.children)
+    instructions = [csemachine.make_instruction(name) for name in names]
+
+    environment = Environment(0, None)
+    for instruction in instructions:
+        if type(instruction) == Identifier:
+            environment.add_variable(instruction.name, 0)
+
+    rounds = 20000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            legacy_lookup(name, environment, csemachine.builtInFunctions)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for instruction in instructions:
+            if type(instruction) == Identifier:
+                environment.lookup(instruction.name)
+            else:
+                instruction.value
+    resolved = time.perf_counter() - start
+
+    lookups = rounds * len(names)
+    print(f"{'path':>12} {'time (s)':>10} {'per symbol (ns)':>16}")
+    print(f"{'strings':>12} {legacy:>10.3f} {legacy / lookups * 1e9:>16.1f}")
+    print(f"{'resolved':>12} {resolved:>10.3f} {resolved / lookups * 1e9:>16.1f}")
+    print(f"speedup: {legacy / resolved:.2f}x")
+
+
+def bench_addressing():
+    """Variable access by name through environments against slots in flat frames."""
+    from environment import Frame
+
+    rounds = 200000
+    print(f"{'depth':>6} {'by name (ns)':>13} {'by slot (ns)':>13}")
+    for depth in (0, 1, 4, 16):
+        # A chain of depth + 1 environments with one variable each; the variable read is in the outermost one.
+        # In a frame, a variable of an outer lambda is one of the values captured by the closure.
+        environment = None
+        for level in range(depth + 1):
+            environment = Environment(level, environment)
+            environment.add_variable(f"v{level}", level)
+        frame = Frame((depth,), tuple(range(depth)))
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            environment.lookup("v0")
+        by_name = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if depth:
+            for _ in range(rounds):
+                frame.captured[0]
+        else:
+            for _ in range(rounds):
+                frame.values[0]
+        by_slot = time.perf_counter() - start
+        print(f"{depth:>6} {by_name / rounds * 1e9:>13.1f} {by_slot / rounds * 1e9:>13.1f}")
+
+    print(f"{'parameters':>10} {'environment (bytes)':>20} {'frame (bytes)':>14}")
+    for parameters in (1, 2, 4):
+        environment = Environment(0, None)
+        for index in range(parameters):
+            environment.add_variable(f"v{index}", index)
+        environment_size = sys.getsizeof(environment) + sys.getsizeof(environment.__dict__) + sys.getsizeof(environment.variables)
+        frame = Frame(tuple(range(parameters)), ())
+        frame_size = sys.getsizeof(frame) + sys.getsizeof(frame.values)
+        print(f"{parameters:>10} {environment_size:>20} {frame_size:>14}")
+
+
+# A program that keeps `count` closures, each made inside a function with `locals` other parameters.
+def closures_program(count, locals):
+    parameters = " ".join(f"p{i}" for i in range(locals))
+    calls = ", ".join(f"make {' '.join(['0'] * locals)} {i}" for i in range(count))
+    return (
+        f"let make {parameters} n = fn x. x + n in\n"
+        f"let closures = ({calls}) in\n"
+        f"Print (closures 1 0, Order closures)\n"
+    )
+
+
+def bench_closures():
+    """Environments kept alive by closures, which capture only the variables they use."""
+    print(f"{'closures':>9} {'created':>10} {'peak live':>10} {'live at exit':>13}")
+    for count in (10, 100, 1000):
+        report = memory_report(closures_program(count, 4))
+        print(f"{count:>9} {report['Environments created']:>10} {report['Peak live environments']:>10} "
+              f"{report['Live environments at exit']:>13}")
+
+
+# Arithmetic- and recursion-heavy programs used to compare the execution engines. The palindrome
+# search of test_files/Q6.txt is added to them when the benchmark runs.
+ENGINE_PROGRAMS = {
+    "arithmetic": "let rec sum (n, acc) = n eq 0 -> acc | sum (n - 1, acc + n * 2 - n / 3)\n"
+                  "in Print (sum (30000, 0))\n",
+    "fibonacci": "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in Print (fib 20)\n",
+}
+ENGINES = ["cse", "vm", "closure"]
+
+
+def bench_engines():
+    """Execution engines compared on arithmetic- and recursion-heavy programs."""
+    print(f"{'program':>12}" + "".join(f" {engine + ' (s)':>10}" for engine in ENGINES) + f" {'speedup':>8}")
+    with open(os.path.join(ROOT, "test_files", "Q6.txt")) as file:
+        programs = dict(ENGINE_PROGRAMS, palindromes=file.read().replace("200", "3000"))
+
+    empty = {engine: time_program("Print 0\n", f"--engine={engine}") for engine in ENGINES}
+    for name, source in programs.items():
+        times = [time_program(source, f"--engine={engine}") - empty[engine] for engine in ENGINES]
+        print(f"{name:>12}" + "".join(f" {elapsed:>10.3f}" for elapsed in times) + f" {times[0] / min(times[1:]):>7.2f}x")
+
+
+def bench_aug():
+    """Building tuples element by element with aug."""
+    program = ("let rec build (n, acc) = n eq 0 -> acc | build (n - 1, acc aug n)\n"
+               "in Print (Order (build ({}, nil)))\n")
+    empty = time_program(program.format(0))
+    print(f"{'elements':>10} {'time (s)':>10} {'per element (us)':>17}")
+    for elements in (1000, 10000, 100000):
+        elapsed = time_program(program.format(elements)) - empty
+        print(f"{elements:>10} {elapsed:>10.3f} {elapsed / elements * 1e6:>17.2f}")
+
+
+def bench_strings():
+    """Reversing and concatenating long strings with Stem, Stern and Conc."""
+    program = ("let rec rev s = s eq '' -> '' | Conc (rev (Stern s)) (Stem s)\n"
+               "in let rec rep (n, s) = n eq 0 -> s | rep (n - 1, Conc s 'abcdefghij')\n"
+               "in Print (rev (rep ({}, '')))\n")
+    empty = time_program(program.format(0))
+    print(f"{'length':>10} {'time (s)':>10} {'per char (us)':>14}")
+    for length in (10000, 20000, 40000):
+        elapsed = time_program(program.format(length // 10)) - empty
+        print(f"{length:>10} {elapsed:>10.3f} {elapsed / length * 1e6:>14.2f}")
+
+
+# The following function runs a program with --mem-stats and returns the elapsed time,
+# the peak resident memory of the interpreter process in MB and the memory report.
+def measure_program(source, *switches):
+    path = write_program(source)
+    try:
+        start = time.perf_counter()
+        process = subprocess.Popen([PYTHON, APP, "--mem-stats", "--no-cache", *switches, path],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        report = process.stderr.read()
+        # wait4 reports the resource usage of this child alone.
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        return elapsed, usage.ru_maxrss / 1024, dict(line.split(": ") for line in report.splitlines())
+    finally:
+        os.remove(path)
+
+
+def bench_tailcall():
+    """Loops written as tail recursion run in constant space."""
+    program = "let rec loop n = n eq 0 -> 'done' | loop (n - 1) in Print (loop {})\n"
+    budget = 16                     # Live environments a loop may keep, whatever its length
+    print(f"{'iterations':>10} {'time (s)':>10} {'peak RSS (MB)':>14} {'peak live envs':>15}")
+    for iterations in (10000, 100000, 1000000):
+        elapsed, memory, report = measure_program(program.format(iterations))
+        peak = int(report["Peak live environments"])
+        print(f"{iterations:>10} {elapsed:>10.3f} {memory:>14.1f} {peak:>15}")
+        if peak > budget:
+            print(f"FAIL: {peak} live environments exceed the budget of {budget}")
+            sys.exit(1)
+
+
+# A loop that builds a tuple of `length` elements on each iteration, either in the body of a function it
+# calls or in its own body.
+def call_program(length, iterations, call):
+    elements = ", ".join(["n"] + ["1"] * (length - 1))
+    tuple_size = f"Order (f n)" if call else f"Order ({elements})"
+    return (
+        f"let f n = ({elements}) in\n"
+        f"let rec loop n = n eq 0 -> 0 | loop (n - 1 + {tuple_size} - {length})\n"
+        f"in Print (loop {iterations})\n"
+    )
+
+
+def bench_calls():
+    """Cost of a call as the body of the called function grows: the call runs the body in place."""
+    import io
+    from csemachine import CSEMachine
+    from pipeline import Pipeline
+
+    iterations = 2000
+    print(f"{'body length':>12} {'inline (us)':>12} {'called (us)':>12} {'call cost (us)':>15}")
+    for length in (2, 10, 100, 1000):
+        times = []
+        for call in (False, True):
+            control_structures = Pipeline(source=call_program(length, iterations, call)).control_structures
+            best = None
+            for _ in range(5):
+                machine = CSEMachine(control_structures, io.StringIO())
+                start = time.perf_counter()
+                machine.run()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            times.append(best / iterations * 1e6)
+        print(f"{length:>12} {times[0]:>12.2f} {times[1]:>12.2f} {times[1] - times[0]:>15.2f}")
+
+
+# The palindrome search of test_files/Q6.txt up to `end`. The recursive functions are either plain lambdas or,
+# when `unrolled` is set, wrapped in a conditional so that they are not recognized and Y* unrolls them through
+# an eta on every call, which is how every recursive function used to run. The
+# conditional adds a little to each unrolled call as well.
+def palindromes_program(end, unrolled):
+    wrap = (lambda function: f"true -> ({function}) | dummy") if unrolled else (lambda function: function)
+    reverse = wrap("fn (n, x) . n gr 0 -> reverse (n/10, (x*10 + (n-(n/10)*10))) | x")
+    iterate = wrap("fn n . n gr end -> 'Done' | is_palindrome n -> (iterate(n+1), print(' '), print(n)) | iterate(n+1)")
+    return (
+        f"let rec reverse = {reverse} in\n"
+        f"let is_palindrome n = n eq reverse (n, 0) in\n"
+        f"let print_palindromes (start, end) =\n"
+        f"    let rec iterate = {iterate}\n"
+        f"    in iterate(start)\n"
+        f"in Order (print_palindromes(2, {end}))\n"
+    )
+
+
+def bench_letrec():
+    """Recursive calls of test_files/Q6.txt through a self-referential closure and through Y* unrolling."""
+    import io
+    from csemachine import CSEMachine
+    from pipeline import Pipeline
+
+    print(f"{'end':>8} {'unrolled (s)':>13} {'direct (s)':>11} {'speedup':>8}")
+    for end in (1000, 5000, 20000):
+        times = []
+        for unrolled in (True, False):
+            control_structures = Pipeline(source=palindromes_program(end, unrolled)).control_structures
+            best = None
+            for _ in range(3):
+                machine = CSEMachine(control_structures, io.StringIO())
+                start = time.perf_counter()
+                machine.run()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            times.append(best)
+        print(f"{end:>8} {times[0]:>13.3f} {times[1]:>11.3f} {times[0] / times[1]:>7.2f}x")
+
+
+# A loop that calls a function of `arity` parameters on each iteration.
+def arity_program(arity, iterations):
+    parameters = ", ".join(f"a{i}" for i in range(arity))
+    arguments = ", ".join(["n"] + ["1"] * (arity - 1))
+    return (
+        f"let f ({parameters}) = a0 - 1 in\n"
+        f"let rec loop n = n eq 0 -> 0 | loop (f ({arguments}))\n"
+        f"in Print (loop {iterations})\n"
+    )
+
+
+def bench_binding():
+    """Binding the arguments of 2- and 4-argument calls: splitting the parameters against a binding plan."""
+    import io
+    from csemachine import CSEMachine
+    from pipeline import Pipeline
+    from values import Vector
+
+    rounds = 200000
+    iterations = 20000
+    print(f"{'arity':>6} {'split (ns)':>11} {'plan (ns)':>10} {'call (us)':>10}")
+    for arity in (2, 4):
+        bounded_variable = ",".join(f"a{i}" for i in range(arity))
+        argument = Vector(list(range(arity)))
+
+        # Rule 11 before binding plans: the parameters were counted in the joined string on every call.
+        start = time.perf_counter()
+        for _ in range(rounds):
+            if "," in bounded_variable:
+                tuple([argument[i] for i in range(bounded_variable.count(",") + 1)])
+        split = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            if arity != 1 and type(argument) == Vector and argument.length == arity:
+                tuple(argument.items[:arity])
+        plan = time.perf_counter() - start
+
+        control_structures = Pipeline(source=arity_program(arity, iterations)).control_structures
+        best = None
+        for _ in range(5):
+            machine = CSEMachine(control_structures, io.StringIO())
+            start = time.perf_counter()
+            machine.run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{arity:>6} {split / rounds * 1e9:>11.1f} {plan / rounds * 1e9:>10.1f} {best / iterations * 1e6:>10.2f}")
+
+
+# A generated program with deeply nested lets, a long aug chain and deeply nested parentheses.
+def deep_program(lets, augs, parentheses):
+    source = ["let x0 = 0 in\n"]
+    source += [f"let x{i} = x{i - 1} + 1 in\n" for i in range(1, lets)]
+    chain = " aug ".join(["nil"] + [str(i) for i in range(augs)])
+    nested = "(" * parentheses + "1" + ")" * parentheses
+    source.append(f"Print (x{lets - 1}, Order ({chain}), {nested})\n")
+    return "".join(source)
+
+
+def bench_deep():
+    """Front end and execution of a generated program with over 100k tree nodes."""
+    from pipeline import Pipeline
+
+    path = write_program(deep_program(10000, 20000, 2000))
+    try:
+        pipeline = Pipeline(path, use_cache=False)
+        start = time.perf_counter()
+        ast = pipeline.ast
+        parsed = time.perf_counter()
+
+        # The standardizer rewrites the AST, so its nodes are counted first.
+        nodes = 0
+        pending = [ast]
+        while pending:
+            node = pending.pop()
+            nodes += 1
+            pending.extend(node.children)
+
+        restart = time.perf_counter()
+        pipeline.st
+        standardized = time.perf_counter()
+        pipeline.control_structures
+        generated = time.perf_counter()
+
+        print(f"AST nodes: {nodes}")
+        print(f"{'stage':>22} {'time (s)':>10}")
+        print(f"{'lex and parse':>22} {parsed - start:>10.3f}")
+        print(f"{'standardize':>22} {standardized - restart:>10.3f}")
+        print(f"{'control structures':>22} {generated - standardized:>10.3f}")
+        for switch in ("-ast", "-st"):
+            subprocess.run([PYTHON, APP, "--no-cache", switch, path], check=True, stdout=subprocess.DEVNULL)
+        for engine in ENGINES:
+            start = time.perf_counter()
+            subprocess.run([PYTHON, APP, "--no-cache", f"--engine={engine}", path], check=True, stdout=subprocess.DEVNULL)
+            print(f"{'run (' + engine + ')':>22} {time.perf_counter() - start:>10.3f}")
+    finally:
+        os.remove(path)
+
+
+def bench_startup():
+    """Printing the trees and running a large program, which share one pass of the front end."""
+    path = write_program(deep_program(5000, 5000, 500))
+    try:
+        print(f"{'switches':>22} {'time (s)':>10}")
+        for switches in ([], ["-ast"], ["-st"], ["-ast", "-st", "--engine=cse"]):
+            start = time.perf_counter()
+            subprocess.run([PYTHON, APP, "--no-cache", *switches, path], check=True, stdout=subprocess.DEVNULL)
+            print(f"{' '.join(switches) or '(none)':>22} {time.perf_counter() - start:>10.3f}")
+    finally:
+        os.remove(path)
+
+
+def bench_cache():
+    """Cold runs that compile a large program against warm runs that load it from the cache."""
+    from cache import cache_path
+
+    source = deep_program(5000, 5000, 500)
+    path = write_program(source)
+    try:
+        print(f"{'run':>10} {'time (s)':>10}")
+        for label, switches in (("no cache", ["--no-cache"]), ("cold", []), ("warm", [])):
+            start = time.perf_counter()
+            subprocess.run([PYTHON, APP, *switches, path], check=True, stdout=subprocess.DEVNULL)
+            print(f"{label:>10} {time.perf_counter() - start:>10.3f}")
+    finally:
+        if os.path.exists(cache_path(path, source)):
+            os.remove(cache_path(path, source))
+        os.remove(path)
+
+
+def bench_batch():
+    """Separate interpreter runs against one --batch run over the same programs."""
+    import shutil
+
+    directory = tempfile.mkdtemp()
+    try:
+        programs = [name for name in sorted(os.listdir(os.path.join(ROOT, "test_files")))
+                    if os.path.isfile(os.path.join(ROOT, "test_files", name))]
+        for i in range(8):
+            for name in programs:
+                shutil.copy(os.path.join(ROOT, "test_files", name), os.path.join(directory, f"{i}_{name}"))
+        count = len(os.listdir(directory))
+
+        start = time.perf_counter()
+        for name in sorted(os.listdir(directory)):
+            subprocess.run([PYTHON, APP, "--no-cache", os.path.join(directory, name)], check=True, stdout=subprocess.DEVNULL)
+        separate = time.perf_counter() - start
+
+        print(f"{count} programs")
+        print(f"{'run':>16} {'time (s)':>10}")
+        print(f"{'separate':>16} {separate:>10.3f}")
+        for jobs in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            subprocess.run([PYTHON, APP, "--batch", "-j", str(jobs), "--no-cache", directory], check=True, stdout=subprocess.DEVNULL)
+            print(f"{'batch -j ' + str(jobs):>16} {time.perf_counter() - start:>10.3f}")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_serve():
+    """Latency of small programs run by a fresh interpreter against the thin client of a warm server."""
+    socket_path = os.path.join(tempfile.mkdtemp(), "rpal.sock")
+    server = subprocess.Popen([PYTHON, APP, "--serve", "-j", "2", f"--socket={socket_path}"], stderr=subprocess.DEVNULL)
+    try:
+        while not os.path.exists(socket_path):
+            if server.poll() is not None:
+                raise RuntimeError("The server did not start")
+            time.sleep(0.05)
+
+        programs = [os.path.join(ROOT, "test_files", f"Q{i}.txt") for i in range(1, 9)]
+        commands = {
+            "myrpal.py": lambda program: [PYTHON, APP, "--no-cache", program],
+            "client.py": lambda program: [PYTHON, os.path.join(ROOT, "client.py"), f"--socket={socket_path}", program],
+        }
+        print(f"{'command':>12} {'ms per program':>16}")
+        for label, command in commands.items():
+            start = time.perf_counter()
+            for _ in range(4):
+                for program in programs:
+                    subprocess.run(command(program), check=True, stdout=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>12} {elapsed / (4 * len(programs)) * 1000:>16.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+        os.rmdir(os.path.dirname(socket_path))
+
+
+# A large program that uses every kind of token: identifiers, integers, operators, strings and comments.
+def lexer_program(size):
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = (f"let f{i} (a, b) = a * {i} + b ** 2 >= {i} & not (a eq b) -> 'text\\t{i}, (ok)' | Conc 'x' 'y'"
+                f" in // comment {i}\n")
+        lines.append(line)
+        total += len(line)
+        i += 1
+    lines.append("Print (f0 (3, 4))\n")
+    return "".join(lines)
+
+
+def bench_lexer():
+    """Throughput of the regular-expression lexer against the character-by-character lexer."""
+    from lexer import Lexer, CharLexer
+
+    source = lexer_program(1024 * 1024)
+    megabytes = len(source.encode()) / (1024 * 1024)
+    results = {}
+    print(f"{megabytes:.1f} MB of source")
+    print(f"{'lexer':>10} {'time (s)':>10} {'MB/s':>8}")
+    for name, lexer in (("CharLexer", CharLexer), ("Lexer", Lexer)):
+        start = time.perf_counter()
+        tokens = lexer(source).tokenize()
+        elapsed = time.perf_counter() - start
+        results[name] = [(token.type, token.value) for token in tokens]
+        print(f"{name:>10} {elapsed:>10.3f} {megabytes / elapsed:>8.1f}")
+    print("identical tokens:", results["CharLexer"] == results["Lexer"])
+
+
+# A large flat program: one long expression of tuples, conditionals, comparisons and applications.
+def expression_program(size):
+    terms = []
+    total = 0
+    i = 0
+    while total < size:
+        term = f"(x{i} gr {i} or y ls -{i}) & z ne 'a' -> f x{i} (g {i}) @h true | x{i} * {i} - y / 2 ** 3"
+        terms.append(term)
+        total += len(term) + 2
+        i += 1
+    return "let f x y = x and g x = x and h x y = y in Print (" + ",\n".join(terms) + ")\n"
+
+
+# A large arithmetic expression over integer literals.
+def arithmetic_program(size):
+    terms = []
+    total = 0
+    i = 0
+    while total < size:
+        term = f"{i} * {i + 1} - {i + 2} / 3 + 4 ** 2"
+        terms.append(term)
+        total += len(term) + 3
+        i += 1
+    return "Print (" + " +\n".join(terms) + ")\n"
+
+
+def bench_parser():
+    """Parsing time of large generated programs, with the tokens lexed beforehand."""
+    from lexer import Lexer
+    from parser import Parser
+
+    print(f"{'program':>12} {'tokens':>9} {'time (s)':>10} {'tokens/s':>10}")
+    programs = (
+        ("let chain", lexer_program(1024 * 1024)),
+        ("expression", expression_program(1024 * 1024)),
+        ("arithmetic", arithmetic_program(1024 * 1024)),
+    )
+    for name, source in programs:
+        tokens = Lexer(source).tokenize()
+        best = None
+        for _ in range(3):
+            start = time.perf_counter()
+            Parser(tokens).parse()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>12} {len(tokens):>9} {best:>10.3f} {len(tokens) / best:>10.0f}")
+
+
+# The following function returns the number of bytes taken by the nodes of a tree, their attributes and children.
+def tree_size(root):
+    seen = set()
+    size = 0
+    pending = [root]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, list):
+            pending.extend(item)
+        elif hasattr(item, "__dict__"):
+            pending.append(item.__dict__)
+            pending.extend(item.__dict__.values())
+        elif hasattr(item, "__slots__"):
+            pending.extend(getattr(item, slot) for slot in item.__slots__)
+    return size
+
+
+def bench_ast():
+    """Memory and time of building and standardizing the trees of a 1 MB program."""
+    import tracemalloc
+    from lexer import Lexer
+    from parser import Parser
+    from standadizer import standardize
+
+    print(f"{'program':>12} {'nodes':>8} {'parse (s)':>10} {'AST (MB)':>9} {'standardize (s)':>16} {'extra (MB)':>11}")
+    for name, source in (("let chain", lexer_program(1024 * 1024)), ("expression", expression_program(1024 * 1024))):
+        tokens = Lexer(source).tokenize()
+        start = time.perf_counter()
+        ast = Parser(tokens).parse()
+        parsed = time.perf_counter()
+
+        nodes = 0
+        pending = [ast]
+        while pending:
+            node = pending.pop()
+            nodes += 1
+            pending.extend(node.children)
+        size = tree_size(ast)
+
+        restart = time.perf_counter()
+        standardize(ast)
+        standardized = time.perf_counter()
+
+        # The memory the standardizer allocates on top of the AST, measured on a second copy of the tree.
+        ast = Parser(tokens).parse()
+        tracemalloc.start()
+        try:
+            standardize(ast)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        print(f"{name:>12} {nodes:>8} {parsed - start:>10.3f} {size / (1024 * 1024):>9.1f} "
+              f"{standardized - restart:>16.3f} {peak / (1024 * 1024):>11.1f}")
+
+
+# The following script lexes and parses a file in a child process, taking the tokens from a list, from a
+# stream over the source, or from the file read in chunks.
+STREAMING_SCRIPT = """
+import sys
+from lexer import Lexer, stream_tokens
+from parser import Parser
+
+mode, path = sys.argv[1:]
+if mode == "file chunks":
+    with open(path) as file:
+        Parser(stream_tokens(file)).parse()
+else:
+    source = open(path).read()
+    tokens = Lexer(source).tokenize() if mode == "list" else Lexer(source).tokens()
+    Parser(tokens).parse()
+"""
+
+
+def bench_streaming():
+    """Peak memory of lexing and parsing 2 MB of source from a token list, a token stream and a file read in chunks."""
+    path = write_program(lexer_program(2 * 1024 * 1024))
+    try:
+        print(f"{'tokens from':>14} {'time (s)':>10} {'peak RSS (MB)':>14}")
+        for mode in ("list", "stream", "file chunks"):
+            start = time.perf_counter()
+            process = subprocess.Popen([PYTHON, "-c", STREAMING_SCRIPT, mode, path], cwd=ROOT)
+            # wait4 reports the resource usage of this child alone.
+            _, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+            if os.waitstatus_to_exitcode(status) != 0:
+                raise subprocess.CalledProcessError(os.waitstatus_to_exitcode(status), process.args)
+            print(f"{mode:>14} {elapsed:>10.3f} {usage.ru_maxrss / 1024:>14.1f}")
+    finally:
+        os.remove(path)
+
+
+BENCHMARKS = {
+    "scope": bench_scope,
+    "environments": bench_environments,
+    "recursion": bench_recursion,
+    "symbols": bench_symbols,
+    "addressing": bench_addressing,
+    "closures": bench_closures,
+    "engines": bench_engines,
+    "aug": bench_aug,
+    "strings": bench_strings,
+    "tailcall": bench_tailcall,
+    "calls": bench_calls,
+    "letrec": bench_letrec,
+    "binding": bench_binding,
+    "deep": bench_deep,
+    "startup": bench_startup,
+    "cache": bench_cache,
+    "batch": bench_batch,
+    "serve": bench_serve,
+    "lexer": bench_lexer,
+    "streaming": bench_streaming,
+    "parser": bench_parser,
+    "ast": bench_ast,
+}
+
+
+def main():
+    names = sys.argv[1:]
+    if not names:
+        print("Available benchmarks:")
+        for name, function in BENCHMARKS.items():
+            print(f"  {name:<12} {function.__doc__}")
+        return
+
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}")
+            sys.exit(1)
+        print(f"== {name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+On-disk cache of compiled RPAL programs.
+
+Like __pycache__ for Python modules, the control structures generated for a
+program are pickled into a __rpalcache__ directory next to its source file. An
+entry is keyed by a hash of the source and of the interpreter modules that
+produce the control structures, so editing either one invalidates it. Entries
+are touched when they are used, and the least recently used ones are removed
+when the directory grows beyond MAX_CACHE_SIZE bytes.
+
+The cache is only an optimization: any error while reading or writing it is
+ignored and the program is compiled from its source as usual. Unpickling a file
+can run any code in it, so an entry is only loaded when it belongs to the
+current user and no one else can write to it.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+CACHE_DIRECTORY = "__rpalcache__"
+MAX_CACHE_SIZE = 64 * 1024 * 1024
+SUFFIX = ".pickle"
+
+# The modules whose code decides the contents of the control structures.
+FRONT_END_MODULES = ["lexer.py", "parser.py", "node.py", "standadizer.py", "csemachine.py", "structures.py", "values.py", "primitives.py", "cache.py"]
+
+interpreter_version = None
+
+
+# The following function returns a hash of the interpreter modules, computed once per run.
+def get_interpreter_version():
+    global interpreter_version
+    if interpreter_version is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for module in FRONT_END_MODULES:
+            with open(os.path.join(root, module), "rb") as file:
+                digest.update(file.read())
+        interpreter_version = digest.hexdigest()
+    return interpreter_version
+
+
+# The following function returns the path of the cache entry of a program.
+def cache_path(filename, source):
+    digest = hashlib.sha256(get_interpreter_version().encode())
+    digest.update(source.encode())
+    directory = os.path.join(os.path.dirname(os.path.abspath(filename)), CACHE_DIRECTORY)
+    return os.path.join(directory, digest.hexdigest() + SUFFIX)
+
+
+# The following function returns the cached control structures of a program, or None on a miss.
+def load(filename, source):
+    try:
+        path = cache_path(filename, source)
+        with open(path, "rb") as file:
+            if not is_trusted(file):
+                return None
+            control_structures = pickle.load(file)
+        # Touching the entry marks it as recently used.
+        os.utime(path)
+        return control_structures
+    except Exception:
+        return None
+
+
+# The following function checks that an open cache entry belongs to the current user and is not writable by others.
+def is_trusted(file):
+    if not hasattr(os, "getuid"):
+        return True
+    status = os.fstat(file.fileno())
+    return status.st_uid == os.getuid() and not status.st_mode & 0o022
+
+
+# The following function stores the control structures of a program and evicts old entries.
+def store(filename, source, control_structures):
+    try:
+        path = cache_path(filename, source)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # The entry is written to a temporary file first, so other runs never read a partial entry.
+        handle, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, "wb") as file:
+                pickle.dump(control_structures, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+        evict(directory)
+    except Exception:
+        pass
+
+
+# The following function removes the least recently used entries until the directory fits in MAX_CACHE_SIZE.
+def evict(directory, max_size=MAX_CACHE_SIZE):
+    entries = []
+    total = 0
+    for name in os.listdir(directory):
+        if not name.endswith(SUFFIX):
+            continue
+        try:
+            status = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        entries.append((status.st_mtime, status.st_size, name))
+        total += status.st_size
+
+    entries.sort()
+    for _, size, name in entries:
+        if total <= max_size:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+        total -= size
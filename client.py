@@ -0,0 +1,90 @@
+"""
+Thin client for the RPAL interpreter server
+Usage: python client.py [--socket=path] [--timeout=seconds] [--engine=cse|vm|closure] filename
+
+Sends a program to a server started with `python myrpal.py --serve` and prints
+its output, so that running a program looks like running myrpal.py. Only the
+standard library modules needed to talk to the socket are imported, so the
+client starts much faster than the interpreter itself.
+"""
+
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "rpal.sock")
+HEADER = struct.Struct(">I")            # Length of the JSON message that follows
+
+
+# The following function encodes a message for the socket.
+def encode_message(message):
+    data = json.dumps(message).encode()
+    return HEADER.pack(len(data)) + data
+
+
+# The following function reads exactly size bytes from the socket.
+def receive(connection, size):
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("The server closed the connection")
+        data += chunk
+    return data
+
+
+# The following function sends a program to a server and returns its output and exit status.
+def request(source, engine="cse", path=DEFAULT_SOCKET, timeout=None):
+    message = {"source": source, "engine": engine}
+    if timeout is not None:
+        message["timeout"] = timeout
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(encode_message(message))
+        (length,) = HEADER.unpack(receive(connection, HEADER.size))
+        response = json.loads(receive(connection, length))
+    return response["output"], response["status"]
+
+
+def main():
+    arguments = sys.argv[1:]
+    if not arguments or arguments[-1].startswith("-"):
+        print("Usage: python client.py [--socket=path] [--timeout=seconds] [--engine=cse|vm|closure] filename")
+        sys.exit(1)
+
+    path, engine, timeout = DEFAULT_SOCKET, "cse", None
+    for switch in arguments[:-1]:
+        if switch.startswith("--socket="):
+            path = switch[len("--socket="):]
+        elif switch.startswith("--engine="):
+            engine = switch[len("--engine="):]
+        elif switch.startswith("--timeout="):
+            timeout = float(switch[len("--timeout="):])
+        else:
+            print(f"Unknown switch: {switch}")
+            sys.exit(1)
+
+    filename = arguments[-1]
+    try:
+        with open(filename, "r") as file:
+            source = file.read()
+    except OSError as e:
+        print(f"Error reading file '{filename}': {e}")
+        sys.exit(1)
+
+    try:
+        output, status = request(source, engine, path, timeout)
+    except OSError as e:
+        print(f"Error connecting to the server: {e}")
+        sys.exit(1)
+
+    sys.stdout.write(output)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
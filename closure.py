@@ -0,0 +1,338 @@
+"""
+Closure-compilation engine for RPAL programs.
+
+Every node of the standardized tree is compiled into a Python function that
+takes the current frame and returns the value of the node. Literals are folded
+at compile time, operators on constant operands are evaluated once, and every
+identifier is resolved to a (depth, slot) address, so evaluating a program is a
+direct call tree instead of the control/stack shuffle of the CSE machine.
+
+A frame is a list holding the parent frame followed by the values bound by a
+lambda. The CSE machine stays the reference implementation: operands are
+evaluated in the same order so that side effects of Print match it.
+"""
+
+import sys
+import threading
+from csemachine import make_instruction
+from errors import RPALError
+from primitives import BINARY_FUNCTIONS, UNARY_FUNCTIONS, BUILT_IN_FUNCTIONS, builtInFunctions, print_value, concatenate
+from structures import *
+from values import Vector, format_result
+
+NOT_CONSTANT = object()
+
+
+# The stack size and the recursion limit are process-wide settings, so threads that run
+# interpreters at the same time share them. The recursion limit is raised while any deep
+# thread is running and restored when the last one finishes.
+deep_stack_lock = threading.Lock()
+deep_stack_threads = 0
+previous_recursion_limit = None
+
+
+# The following function runs a function on a thread with a large call stack and recursion limit.
+# Compiling and evaluating closures recurse as deeply as the RPAL program nests, unlike the other
+# engines and the front end, which use explicit stacks. The raised limit only makes room for deeper
+# programs: a program that nests deeper than the stack allows still fails with a RecursionError.
+def run_with_deep_stack(function, *arguments, stack_size=512 * 1024 * 1024, recursion_limit=1000000):
+    global deep_stack_threads, previous_recursion_limit
+    result = []
+    error = []
+
+    def target():
+        try:
+            result.append(function(*arguments))
+        except BaseException as exception:
+            error.append(exception)
+
+    thread = threading.Thread(target=target)
+    with deep_stack_lock:
+        if deep_stack_threads == 0:
+            previous_recursion_limit = sys.getrecursionlimit()
+            sys.setrecursionlimit(max(recursion_limit, previous_recursion_limit))
+        deep_stack_threads += 1
+
+    try:
+        # The stack size only applies to threads started while it is set.
+        with deep_stack_lock:
+            previous_stack_size = threading.stack_size(stack_size)
+            try:
+                thread.start()
+            finally:
+                threading.stack_size(previous_stack_size)
+        thread.join()
+    finally:
+        with deep_stack_lock:
+            deep_stack_threads -= 1
+            if deep_stack_threads == 0:
+                sys.setrecursionlimit(previous_recursion_limit)
+
+    # Exceptions, including SystemExit, are raised again in the calling thread.
+    if error:
+        raise error[0]
+    return result[0]
+
+
+class Closure:
+    """A compiled lambda together with the frame it was created in."""
+    __slots__ = ("body", "frame", "arity", "number", "bounded_variable", "returns_lambda")
+
+    def __init__(self, body, frame, arity, number, bounded_variable, returns_lambda=False):
+        self.body = body
+        self.frame = frame
+        self.arity = arity
+        self.number = number
+        self.bounded_variable = bounded_variable
+        self.returns_lambda = returns_lambda        # Whether the body is a lambda
+
+
+class RecursiveClosure:
+    """The value of Y* applied to a lambda. Applying it unrolls the recursion by one step."""
+    __slots__ = ("closure",)
+
+    def __init__(self, closure):
+        self.closure = closure
+
+    # It is shown as the lambda it was made from, like an eta in the CSE machine.
+    @property
+    def number(self):
+        return self.closure.number
+
+    @property
+    def bounded_variable(self):
+        return self.closure.bounded_variable
+
+
+class Partial:
+    """A built-in function that has received the first of its two arguments."""
+    __slots__ = ("function", "argument")
+
+    def __init__(self, function, argument):
+        self.function = function
+        self.argument = argument
+
+
+class ClosureMachine:
+    """Compiles a standardized tree into nested closures and evaluates it."""
+    def __init__(self, output=None):
+        self.print_present = False
+        self.output = output
+        self.lambda_count = 0
+        self.folded = {}                # Results of fold, by node
+        self.depth = 0                  # Number of lambdas around the node being compiled
+        self.bindings = {}              # (depth, slot) of the lambdas that bind each name, innermost last
+
+    # The following function binds the argument of a call in a new frame and evaluates the body.
+    def call(self, closure, rand):
+        arity = closure.arity
+        if arity == 1:
+            return closure.body([closure.frame, rand])
+        if len(rand) == arity:
+            return closure.body([closure.frame, *rand])
+        return closure.body([closure.frame] + [rand[i] for i in range(arity)])
+
+    # The following function applies any value to an argument.
+    def apply(self, rator, rand):
+        if type(rator) == Closure:
+            return self.call(rator, rand)
+
+        elif type(rator) == Vector:
+            return rator[rand - 1]
+
+        elif type(rator) == Partial:
+            return rator.function(rator.argument, rand)
+
+        # A lambda that binds the recursive name and only returns another lambda is bound at once to a
+        # closure of the inner lambda whose frame holds itself, as in Rule 12 of the CSE machine.
+        elif rator == "Y*":
+            if rand.returns_lambda and rand.arity == 1:
+                frame = [rand.frame, None]
+                frame[1] = rand.body(frame)
+                return frame[1]
+            return RecursiveClosure(rand)
+
+        # The recursive function is obtained by applying the lambda to the recursive closure.
+        elif type(rator) == RecursiveClosure:
+            return self.apply(self.call(rator.closure, rator), rand)
+
+        elif rator == "Print" or rator == "print":
+            self.print_present = True
+            return print_value(rand, self.output)
+
+        elif rator == "Conc":
+            return Partial(concatenate, rand)
+
+        elif rator in builtInFunctions:
+            return BUILT_IN_FUNCTIONS[rator](rand)
+
+        raise RPALError("Cannot apply: " + format_result(rator))
+
+    # The following function returns the value of a node when it can be computed at compile time.
+    def fold(self, node):
+        if id(node) not in self.folded:
+            self.folded[id(node)] = self.fold_node(node)
+        return self.folded[id(node)]
+
+    def fold_node(self, node):
+        if not node.children:
+            instruction = make_instruction(node.value)
+            if type(instruction) == Constant:
+                return instruction.value
+            return NOT_CONSTANT
+
+        instruction = make_instruction(node.value)
+        try:
+            if instruction in BINARY_OPERATORS:
+                rand_1 = self.fold(node.children[0])
+                rand_2 = self.fold(node.children[1])
+                if rand_1 is not NOT_CONSTANT and rand_2 is not NOT_CONSTANT:
+                    return BINARY_FUNCTIONS[instruction](rand_1, rand_2)
+            elif instruction in UNARY_OPERATORS:
+                rand = self.fold(node.children[0])
+                if rand is not NOT_CONSTANT:
+                    return UNARY_FUNCTIONS[instruction](rand)
+        except Exception:
+            # Errors such as a division by zero are left to be reported at run time.
+            pass
+        return NOT_CONSTANT
+
+    # The following function compiles a node. The names in scope are found in self.bindings.
+    def compile(self, node):
+        value = self.fold(node)
+        if value is not NOT_CONSTANT:
+            return lambda frame: value
+
+        instruction = make_instruction(node.value)
+        if type(instruction) == Identifier:
+            return self.compile_identifier(instruction.name)
+        elif type(instruction) == Constant:
+            # Only Y* is left here, since every other literal is folded.
+            return lambda frame: instruction.value
+        elif instruction is Opcode.GAMMA:
+            return self.compile_gamma(node)
+        elif node.value == "lambda":
+            return self.compile_lambda(node)
+        elif node.value == "->":
+            return self.compile_conditional(node)
+        elif node.value == "tau":
+            return self.compile_tuple(node)
+        elif instruction in BINARY_OPERATORS:
+            return self.compile_binary(BINARY_FUNCTIONS[instruction], node)
+        elif instruction in UNARY_OPERATORS:
+            return self.compile_unary(UNARY_FUNCTIONS[instruction], node)
+        raise Exception(f"Cannot compile node {node.value}")
+
+    def compile_identifier(self, name):
+        if not self.bindings.get(name):
+            # Like the CSE machine, an undeclared identifier is only reported when it is evaluated.
+            def undeclared(frame):
+                raise RPALError("Undeclared Identifier: " + name)
+            return undeclared
+
+        level, slot = self.bindings[name][-1]
+        depth = self.depth - level
+
+        if depth == 0:
+            return lambda frame: frame[slot]
+        if depth == 1:
+            return lambda frame: frame[0][slot]
+        if depth == 2:
+            return lambda frame: frame[0][0][slot]
+
+        def variable(frame):
+            for _ in range(depth):
+                frame = frame[0]
+            return frame[slot]
+        return variable
+
+    def compile_gamma(self, node):
+        rator = self.compile(node.children[0])
+        rand = self.compile(node.children[1])
+        call = self.call
+        apply = self.apply
+
+        # The operand is evaluated before the operator, as in the CSE machine.
+        def gamma(frame):
+            argument = rand(frame)
+            function = rator(frame)
+            if type(function) == Closure:
+                return call(function, argument)
+            return apply(function, argument)
+        return gamma
+
+    def compile_lambda(self, node):
+        self.lambda_count += 1
+        number = self.lambda_count
+        parameter = node.children[0]
+
+        if parameter.value == ",":
+            names = [child.value[4:-1] for child in parameter.children]
+        else:
+            names = [parameter.value[4:-1]]
+
+        # The names are bound while the body is compiled and unbound afterwards.
+        self.depth += 1
+        for slot, name in enumerate(names, 1):
+            self.bindings.setdefault(name, []).append((self.depth, slot))
+        body = self.compile(node.children[1])
+        for name in names:
+            self.bindings[name].pop()
+        self.depth -= 1
+        arity = len(names)
+        bounded_variable = ",".join(names)
+        returns_lambda = node.children[1].value == "lambda"
+        return lambda frame: Closure(body, frame, arity, number, bounded_variable, returns_lambda)
+
+    def compile_conditional(self, node):
+        condition = self.compile(node.children[0])
+        then_part = self.compile(node.children[1])
+        else_part = self.compile(node.children[2])
+        return lambda frame: then_part(frame) if condition(frame) else else_part(frame)
+
+    def compile_tuple(self, node):
+        # The elements are evaluated from the last to the first, as in the CSE machine.
+        elements = [self.compile(child) for child in reversed(node.children)]
+
+        def tau(frame):
+            values = [element(frame) for element in elements]
+            values.reverse()
+            return Vector(values)
+        return tau
+
+    def compile_binary(self, function, node):
+        rand_1 = self.compile(node.children[0])
+        rand_2 = self.compile(node.children[1])
+        value_2 = self.fold(node.children[1])
+
+        # The second operand is evaluated first, as in the CSE machine.
+        if value_2 is not NOT_CONSTANT:
+            return lambda frame: function(rand_1(frame), value_2)
+
+        def binary(frame):
+            right = rand_2(frame)
+            return function(rand_1(frame), right)
+        return binary
+
+    def compile_unary(self, function, node):
+        rand = self.compile(node.children[0])
+        return lambda frame: function(rand(frame))
+
+    def evaluate(self, st):
+        program = self.compile(st)
+        return program([None])
+
+    # Compiling and evaluating both recurse as deep as the program nests, so they run on a large stack.
+    def run(self, st):
+        return run_with_deep_stack(self.evaluate, st)
+
+
+# The following function is called from the myrpal.py file when the closure engine is selected.
+# The closure engine keeps its frames in Python lists, which are not counted in the statistics.
+def get_result(pipeline, output=None, statistics=None):
+    machine = ClosureMachine(output)
+    result = machine.run(pipeline.st)
+
+    if machine.print_present:
+        print(file=output)
+    return result
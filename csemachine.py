@@ -1,78 +1,179 @@
 import sys
 from lexer import *
-from standadizer import standardize
 from node import *
-from environment import Environment
+from environment import Frame
+from errors import RPALError
 from stack import Stack
 from structures import *
-from parser import Parser, TokenStorage, Tree
-
-control_structures = []
-count = 0
-control = []
-stack = Stack("CSE")                        # Stack for the CSE machine
-environments = [Environment(0, None)]
-current_environment = 0
-builtInFunctions = ["Order", "Print", "print", "Conc", "Stern", "Stem", "Isinteger", "Istruthvalue", "Isstring", "Istuple", "Isfunction", "ItoS"]
-print_present = False
-
-
-def generate_control_structure(root, i):
-    global count
-    
-    while(len(control_structures) <= i):
-        control_structures.append([])
-
-    # When lambda is encountered, we have to generate a new control structure.
-    if (root.value == "lambda"):
-        count += 1
-        left_child = root.children[0]
-        if (left_child.value == ","):
-            temp = Lambda(count)
-            
-            x = ""
-            for child in left_child.children:
-                x += child.value[4:-1] + ","
-            x = x[:-1]
-            
-            temp.bounded_variable = x
-            control_structures[i].append(temp)
+from primitives import aug, builtInFunctions
+from values import Vector, String, is_string, stem, stern, concatenate
+
+opcodes = {opcode.value: opcode for opcode in Opcode}
+
+
+# This function returns the names of the parameters of a lambda node of the standardized tree.
+def lambda_parameters(node):
+    left_child = node.children[0]
+    if (left_child.value == ","):
+        return tuple(child.value[4:-1] for child in left_child.children)
+    return (left_child.value[4:-1],)
+
+# This function finds the free variables of every lambda of the standardized tree: the identifiers used in
+# its body, including in the lambdas inside it, that are bound by a lambda around it. Identifiers that no
+# lambda binds are left out, since they are reported as undeclared when they are evaluated.
+# The free variables are returned in the order they are first used, by lambda node.
+def find_free_variables(root):
+    free_variables = {}
+    scopes = []                         # Parameters and used identifiers of the lambdas being walked
+    bound = {}                          # Number of lambdas being walked that bind each name
+
+    tasks = [(root, False)]
+    while tasks:
+        node, done = tasks.pop()
+        if done:
+            parameters, used = scopes.pop()
+            for name in parameters:
+                bound[name] -= 1
+            free = [name for name in used if name not in parameters and bound.get(name, 0) > 0]
+            free_variables[node] = free
+            if scopes:
+                for name in free:
+                    scopes[-1][1][name] = None
+        elif node.value == "lambda":
+            parameters = set(lambda_parameters(node))
+            for name in parameters:
+                bound[name] = bound.get(name, 0) + 1
+            scopes.append((parameters, {}))
+            tasks.append((node, True))
+            for child in reversed(node.children[1:]):
+                tasks.append((child, False))
         else:
+            if node.value.startswith("<ID:") and scopes:
+                name = node.value[4:-1]
+                if name not in builtInFunctions:
+                    scopes[-1][1][name] = None
+            for child in reversed(node.children):
+                tasks.append((child, False))
+
+    return free_variables
+
+# The tree is traversed with an explicit stack of tasks, so deeply nested programs do not hit the recursion limit.
+# A task either generates the instructions of a node into a control structure, starts a new delta control
+# structure for a branch of a conditional, or appends a single symbol to a control structure.
+#
+# Identifiers are resolved at the same time. Every control structure has the scope of the lambda it belongs
+# to: the slots of the parameters of the lambda and of the free variables its closures capture. A delta
+# shares the scope of the control structure it is part of, since a conditional does not create an environment.
+# A closure captures only the values of the free variables of its lambda, so the frames around it can be
+# reclaimed as soon as the code running in them is done.
+def generate_control_structures(root):
+    control_structures = []
+    count = 0
+    scopes = {0: ({}, {})}
+    free_variables = find_free_variables(root)
+
+    tasks = [("node", root, 0)]
+    while tasks:
+        task, root, i = tasks.pop()
+
+        while(len(control_structures) <= i):
+            control_structures.append([])
+
+        if (task == "symbol"):
+            control_structures[i].append(root)
+            continue
+
+        if (task == "delta"):
+            count += 1
+            temp = Delta(count)
+            control_structures[i].append(temp)
+            scopes[count] = scopes[i]
+            tasks.append(("node", root, count))
+            continue
+
+        # When lambda is encountered, we have to generate a new control structure.
+        if (root.value == "lambda"):
+            count += 1
             temp = Lambda(count)
-            temp.bounded_variable = left_child.value[4:-1]
+            temp.parameters = lambda_parameters(root)
+            temp.arity = len(temp.parameters)
+            temp.bounded_variable = ",".join(temp.parameters)
             control_structures[i].append(temp)
 
-        for child in root.children[1:]:
-            generate_control_structure(child, count)
-
-    elif (root.value == "->"):
-        count += 1
-        temp = Delta(count)
-        control_structures[i].append(temp)
-        generate_control_structure(root.children[1], count)
-        count += 1
-        temp = Delta(count)
-        control_structures[i].append(temp)
-        generate_control_structure(root.children[2], count)
-        control_structures[i].append("beta")
-        generate_control_structure(root.children[0], i)
-
-    elif (root.value == "tau"):
-        n = len(root.children)
-        temp = Tau(n)
-        control_structures[i].append(temp)
-        for child in root.children:
-            generate_control_structure(child, i)
+            # The free variables of a lambda are bound around it, so they resolve in the scope it is created in.
+            free = free_variables[root]
+            temp.captures = tuple(resolve(Identifier(name), scopes[i]) for name in free)
+
+            # When a name is repeated, the last parameter with that name is the one that is visible.
+            slots = {}
+            for slot, name in enumerate(temp.parameters):
+                slots[name] = slot
+            scopes[count] = (slots, {name: slot for slot, name in enumerate(free)})
+
+            for child in reversed(root.children[1:]):
+                tasks.append(("node", child, count))
+
+        # The tasks are pushed in reverse, so the then part is generated first and the condition last.
+        elif (root.value == "->"):
+            tasks.append(("node", root.children[0], i))
+            tasks.append(("symbol", Opcode.BETA, i))
+            tasks.append(("delta", root.children[2], i))
+            tasks.append(("delta", root.children[1], i))
+
+        elif (root.value == "tau"):
+            n = len(root.children)
+            temp = Tau(n)
+            control_structures[i].append(temp)
+            for child in reversed(root.children):
+                tasks.append(("node", child, i))
 
-    else:
-        control_structures[i].append(root.value)
-        for child in root.children:
-            generate_control_structure(child, i)
+        else:
+            instruction = make_instruction(root.value)
+            if type(instruction) == Identifier:
+                instruction = resolve(instruction, scopes[i])
+            control_structures[i].append(instruction)
+            for child in reversed(root.children):
+                tasks.append(("node", child, i))
+
+    return control_structures
+
+# This function resolves an identifier to the slot of a parameter or of a free variable in a scope.
+# An identifier that no lambda binds is left as it is and reported when it is evaluated.
+def resolve(identifier, scope):
+    parameters, free = scope
+    if identifier.name in parameters:
+        return Variable(identifier.name, parameters[identifier.name])
+    if identifier.name in free:
+        return FreeVariable(identifier.name, free[identifier.name])
+    return identifier
+
+# This function describes the closures of a program: for every lambda, its parameters and the free
+# variables its closures capture. It is printed by the --dump-closures switch.
+def describe_closures(control_structures):
+    lambdas = []
+    for structure in control_structures:
+        for symbol in structure:
+            if type(symbol) == Lambda:
+                lambdas.append(symbol)
+
+    lines = []
+    for symbol in sorted(lambdas, key=lambda symbol: symbol.number):
+        names = ", ".join(capture.name for capture in symbol.captures)
+        lines.append(f"lambda {symbol.number} ({symbol.bounded_variable}): {len(symbol.captures)} captured"
+                     + (f": {names}" if names else ""))
+    return "\n".join(lines)
+
+# This function turns the value of a tree node into an instruction for the control structure.
+# Tokens that begin with '<' and end with '>' are converted here once instead of every time they are executed.
+def make_instruction(name):
+    if name in opcodes:
+        return opcodes[name]
+
+    if not (name[0] == "<" and name[-1] == ">"):
+        return name
 
-# This function is used for tokens that begin with '<' and end with '>'.
-def lookup(name):
     name = name[1:-1]
-    info = name.split(":")
+    info = name.split(":", 1)
     
     if (len(info) == 1):
         value = info[0]
@@ -81,351 +182,383 @@ def lookup(name):
         value = info[1]
     
         if data_type == "INT":
-            return int(value)
+            return Constant(int(value))
         
         # The rpal.exe program detects srings only when they begin with ' and end with '.
         # Our code must emulate this behaviour.
         elif data_type == "STR":
-            return value.strip("'")
+            return Constant(value.strip("'"))
         elif data_type == "ID":
+            # Built-in functions can not be redefined, so they are resolved right away.
             if (value in builtInFunctions):
-                return value
+                return Constant(value)
             else:
-                try:
-                    value = environments[current_environment].variables[value]
-                except KeyError:
-                    print("Undeclared Identifier: " + value)
-                    exit(1)
-                else:
-                    return value
+                return Identifier(value)
             
     if value == "Y*":
-        return "Y*"
+        return Constant("Y*")
     elif value == "nil":
-        return ()
+        return Constant(Vector())
     elif value == "true":
-        return True
+        return Constant(True)
     elif value == "false":
-        return False
-    
-def built_in(function, argument):
-    global print_present
-    
-    # The Order function returns the length of a tuple.  
-    if (function == "Order"):
-        order = len(argument)
-        stack.push(order)
-
-    # The Print function prints the output to the command prompt.
-    elif (function == "Print" or function == "print"):
-        # We should print the output only when the 'Print' function is called in the program.
-        print_present = True
-        
-        # If there are escape characters in the string, we need to format it properly.
-        if type(argument) == str:
-            if "\\n" in argument:
-                argument = argument.replace("\\n", "\n")
-            if "\\t" in argument:
-                argument = argument.replace("\\t", "\t")
-
-        #stack.push(argument)
-        print(argument, end='')
-        
-        # For print function, we should return nil/dummy value
-        # not the printed value itself to avoid tuple construction issues
-        stack.push(argument) 
-
-    # The Conc function concatenates two strings.
-    elif (function == "Conc"):
-        stack_symbol = stack.pop()
-        control.pop()
-        temp = argument + stack_symbol
-        stack.push(temp)
-
-    # The Stern function returns the string without the first letter.
-    elif (function == "Stern"):
-        stack.push(argument[1:])
-
-    # The Stem function returns the first letter of the given string.
-    elif (function == "Stem"):
-        stack.push(argument[0])
-
-    # The Isinteger function checks if the given argument is an integer.
-    elif (function == "Isinteger"):
-        if (type(argument) == int):
-            stack.push(True)
-        else:
-            stack.push(False)
-
-    # The Istruthvalue function checks if the given argument is a boolean value.               
-    elif (function == "Istruthvalue"):
-        if (type(argument) == bool):
-            stack.push(True)
-        else:
-            stack.push(False)
+        return Constant(False)
+    return Constant(None)
 
-    # The Isstring function checks if the given argument is a string.
-    elif (function == "Isstring"):
-        if (type(argument) == str):
-            stack.push(True)
-        else:
-            stack.push(False)
-
-    # The Istuple function checks if the given argument is a tuple.
-    elif (function == "Istuple"):
-        if (type(argument) == tuple):
-            stack.push(True)
-        else:
-            stack.push(False)
-
-    # The Isfunction function checks if the given argument is a built-in function.
-    elif (function == "Isfunction"):
-        if (argument in builtInFunctions):
-            return True
-        else:
-            False
+# The control of Rule 13, which applies the unrolled recursive function and then its argument.
+RECURSION_CONTROL = (Opcode.GAMMA, Opcode.GAMMA)
     
-    # The ItoS function converts integers to strings.        
-    elif (function == "ItoS"):
-        if (type(argument) == int):
-            stack.push(str(argument))
-        else:
-            print("Error: ItoS function can only accept integers.")
-            exit()
-
-def apply_rules():
-    op = ["+", "-", "*", "/", "**", "gr", "ge", "ls", "le", "eq", "ne", "or", "&", "aug"]
-    uop = ["neg", "not"]
-
-    global control
-    global current_environment
+class CSEMachine:
+    """
+    The CSE machine that evaluates the control structures of a program.
+    All of its state belongs to the instance, so every program runs on a machine of its own.
+
+    The control is a stack of frames instead of a list of symbols. A frame is either a control structure
+    with the index of its next symbol, which is executed in place from the last symbol to the first, or
+    the environment marker of a function call. Calls and conditionals push a frame and never copy the
+    control structures, so their cost does not depend on the length of the code they run.
+    """
+    def __init__(self, control_structures, output=None, statistics=None):
+        self.control_structures = control_structures
+        self.control = []                               # Stack of (control structure, index) frames and environment markers
+        self.stack = Stack("CSE")                       # Stack for the CSE machine
+        self.new_frame = statistics.frame if statistics else Frame      # Frames are only counted with statistics
+        self.current_environment = self.new_frame((), ())               # The frame of the program binds no variables, e_0
+        self.frame_count = 0                                            # Number of the last frame made
+        self.environment_stack = []                     # Environments to restore when the current function returns
+        self.print_present = False
+        self.output = output                            # Stream for the output of the program, stdout by default
+
+    # The following function runs the program and returns its result.
+    def run(self):
+        block = self.control_structures[0]
+        self.control.append(self.current_environment)
+        self.control.append((block, len(block) - 1))
+        self.stack.push(self.current_environment)
+
+        self.apply_rules()
+        return self.stack[0]
+
+    def built_in(self, function, argument):
+        stack = self.stack
+
+        # The Order function returns the length of a tuple.  
+        if (function == "Order"):
+            order = len(argument)
+            stack.push(order)
+
+        # The Print function prints the output to the command prompt.
+        elif (function == "Print" or function == "print"):
+            # We should print the output only when the 'Print' function is called in the program.
+            self.print_present = True
+
+            # If there are escape characters in the string, we need to format it properly.
+            if type(argument) == String:
+                argument = str(argument)
+            if type(argument) == str:
+                if "\\n" in argument:
+                    argument = argument.replace("\\n", "\n")
+                if "\\t" in argument:
+                    argument = argument.replace("\\t", "\t")
+
+            #stack.push(argument)
+            print(argument, end='', file=self.output)
+
+            # For print function, we should return nil/dummy value
+            # not the printed value itself to avoid tuple construction issues
+            stack.push(argument) 
+
+        # The Conc function concatenates two strings.
+        # The gamma that would apply it to its second argument is skipped by apply_rules.
+        elif (function == "Conc"):
+            stack_symbol = stack.pop()
+            temp = concatenate(argument, stack_symbol)
+            stack.push(temp)
 
-    while(len(control) > 0):
-     
-        symbol = control.pop()
+        # The Stern function returns the string without the first letter.
+        elif (function == "Stern"):
+            stack.push(stern(argument))
 
-        # Rule 1
-        if type(symbol) == str and (symbol[0] == "<" and symbol[-1] == ">"):
-            stack.push(lookup(symbol))
+        # The Stem function returns the first letter of the given string.
+        elif (function == "Stem"):
+            stack.push(stem(argument))
 
-        # Rule 2
-        elif type(symbol) == Lambda:
-            temp = Lambda(symbol.number)
-            temp.bounded_variable = symbol.bounded_variable
-            temp.environment = current_environment
-            stack.push(temp)
+        # The Isinteger function checks if the given argument is an integer.
+        elif (function == "Isinteger"):
+            if (type(argument) == int):
+                stack.push(True)
+            else:
+                stack.push(False)
 
-        # Rule 4
-        elif (symbol == "gamma"):
-            stack_symbol_1 = stack.pop()
-            stack_symbol_2 = stack.pop()
-
-            if (type(stack_symbol_1) == Lambda):
-                current_environment = len(environments)
-                
-                lambda_number = stack_symbol_1.number
-                bounded_variable = stack_symbol_1.bounded_variable
-                parent_environment_number = stack_symbol_1.environment
-
-                parent = environments[parent_environment_number]
-                child = Environment(current_environment, parent)
-                parent.add_child(child)
-                environments.append(child)
-
-                # Rule 11
-                variable_list = bounded_variable.split(",")
-                
-                if (len(variable_list) > 1):
-                    for i in range(len(variable_list)):
-                        child.add_variable(variable_list[i], stack_symbol_2[i])
-                else:
-                    child.add_variable(bounded_variable, stack_symbol_2)
+        # The Istruthvalue function checks if the given argument is a boolean value.               
+        elif (function == "Istruthvalue"):
+            if (type(argument) == bool):
+                stack.push(True)
+            else:
+                stack.push(False)
 
-                stack.push(child.name)
-                control.append(child.name)
-                control += control_structures[lambda_number]
+        # The Isstring function checks if the given argument is a string.
+        elif (function == "Isstring"):
+            if (is_string(argument)):
+                stack.push(True)
+            else:
+                stack.push(False)
 
-            # Rule 10
-            elif (type(stack_symbol_1) == tuple):
-                stack.push(stack_symbol_1[stack_symbol_2 - 1])
+        # The Istuple function checks if the given argument is a tuple.
+        elif (function == "Istuple"):
+            if (type(argument) == Vector):
+                stack.push(True)
+            else:
+                stack.push(False)
 
-            # Rule 12
-            elif (stack_symbol_1 == "Y*"):
-                temp = Eta(stack_symbol_2.number)
-                temp.bounded_variable = stack_symbol_2.bounded_variable
-                temp.environment = stack_symbol_2.environment
-                stack.push(temp)
+        # The Isfunction function checks if the given argument is a built-in function.
+        elif (function == "Isfunction"):
+            if (argument in builtInFunctions):
+                return True
+            else:
+                False
 
-            # Rule 13
-            elif (type(stack_symbol_1) == Eta):
-                temp = Lambda(stack_symbol_1.number)
-                temp.bounded_variable = stack_symbol_1.bounded_variable
-                temp.environment = stack_symbol_1.environment
-                
-                control.append("gamma")
-                control.append("gamma")
-                stack.push(stack_symbol_2)
-                stack.push(stack_symbol_1)
+        # The ItoS function converts integers to strings.        
+        elif (function == "ItoS"):
+            if (type(argument) == int):
+                stack.push(str(argument))
+            else:
+                raise RPALError("Error: ItoS function can only accept integers.")
+
+    def apply_rules(self):
+        # The state is kept in local variables while the machine runs, since they are faster to access.
+        control = self.control
+        stack = self.stack
+        control_structures = self.control_structures
+        environment_stack = self.environment_stack
+        current_environment = self.current_environment
+        new_frame = self.new_frame
+        frame_count = self.frame_count
+
+        # The control structure being executed and the index of its next symbol. Whenever the machine
+        # leaves a control structure before its end, the rest of it is saved as a frame on the control;
+        # a control structure that is finished is not saved, so calls in tail position are visible.
+        block = ()
+        pc = -1
+
+        while True:
+            if pc < 0:
+                if not control:
+                    break
+                frame = control.pop()
+                if type(frame) == tuple:
+                    block, pc = frame
+                    continue
+
+                # Rule 5
+                stack_symbol = stack.pop()
+                stack.pop()
+
+                # The environment of the caller is on top of the environment stack.
+                if (environment_stack):
+                    current_environment = environment_stack.pop()
+                stack.push(stack_symbol)
+                continue
+
+            symbol = block[pc]
+            pc -= 1
+
+            # Rule 1
+            if type(symbol) == Variable:
+                stack.push(current_environment.values[symbol.slot])
+
+            elif type(symbol) == FreeVariable:
+                stack.push(current_environment.captured[symbol.slot])
+
+            # Identifiers that are still names were not bound by any lambda around them.
+            elif type(symbol) == Identifier:
+                raise RPALError("Undeclared Identifier: " + symbol.name)
+
+            elif type(symbol) == Constant:
+                stack.push(symbol.value)
+
+            # Rule 2
+            # The environment of a closure is the tuple of the values of the free variables of its lambda.
+            elif type(symbol) == Lambda:
+                temp = Lambda(symbol.number)
+                temp.bounded_variable = symbol.bounded_variable
+                temp.parameters = symbol.parameters
+                temp.arity = symbol.arity
+                values = current_environment.values
+                captured = current_environment.captured
+                temp.environment = tuple([values[capture.slot] if type(capture) == Variable else captured[capture.slot]
+                                          for capture in symbol.captures])
                 stack.push(temp)
 
-            # Built-in functions
-            elif stack_symbol_1 in builtInFunctions:
-                built_in(stack_symbol_1, stack_symbol_2)
-              
-        # Rule 5
-        elif type(symbol) == str and (symbol[0:2] == "e_"):
-            stack_symbol = stack.pop()
-            stack.pop()
-            
-            if (current_environment != 0):
-                for element in reversed(stack):
-                    if (type(element) == str and element[0:2] == "e_"):
-                        current_environment = int(element[2:])
-                        break
-            stack.push(stack_symbol)
-
-        # Rule 6
-        elif (symbol in op):
-            rand_1 = stack.pop()
-            rand_2 = stack.pop()
-            if (symbol == "+"): 
-                stack.push(rand_1 + rand_2)
-            elif (symbol == "-"):
-                stack.push(rand_1 - rand_2)
-            elif (symbol == "*"):
-                stack.push(rand_1 * rand_2)
-            elif (symbol == "/"):
-                stack.push(rand_1 // rand_2)
-            elif (symbol == "**"):
-                stack.push(rand_1 ** rand_2)
-            elif (symbol == "gr"):
-                stack.push(rand_1 > rand_2)
-            elif (symbol == "ge"):
-                stack.push(rand_1 >= rand_2)
-            elif (symbol == "ls"):
-                stack.push(rand_1 < rand_2)
-            elif (symbol == "le"):
-                stack.push(rand_1 <= rand_2)
-            elif (symbol == "eq"):
-                stack.push(rand_1 == rand_2)
-            elif (symbol == "ne"):
-                stack.push(rand_1 != rand_2)
-            elif (symbol == "or"):
-                stack.push(rand_1 or rand_2)
-            elif (symbol == "&"):
-                stack.push(rand_1 and rand_2)
-            elif (symbol == "aug"):
-                if (type(rand_2) == tuple):
+            # Rule 4
+            elif (symbol is Opcode.GAMMA):
+                stack_symbol_1 = stack.pop()
+                stack_symbol_2 = stack.pop()
+
+                if (type(stack_symbol_1) == Lambda):
+                    # A call in tail position is the last thing the current function does: its exit
+                    # marker is next on the control and nothing but the marker is left on the stack.
+                    # The current environment is exited before the call instead of after it, so loops
+                    # written as tail recursion run in constant space.
+                    if (environment_stack and pc < 0 and control and control[-1] is current_environment and stack[-1] is current_environment):
+                        control.pop()
+                        stack.pop()
+                        current_environment = environment_stack.pop()
+
+                    lambda_number = stack_symbol_1.number
+                    arity = stack_symbol_1.arity
+
+                    # The new environment is only referenced by the stack and the control, so it is reclaimed
+                    # as soon as the call returns. The closures created inside it keep only what they use.
+                    # Rule 11: the values fill the slots of the parameters in order. A tuple of the right
+                    # length is copied at once; anything else is indexed, which reports a missing value.
+                    frame_count += 1
+                    if (arity == 1):
+                        child = new_frame((stack_symbol_2,), stack_symbol_1.environment, frame_count)
+                    elif (type(stack_symbol_2) == Vector and stack_symbol_2.length == arity):
+                        child = new_frame(tuple(stack_symbol_2.items[:arity]), stack_symbol_1.environment, frame_count)
+                    else:
+                        child = new_frame(tuple([stack_symbol_2[i] for i in range(arity)]), stack_symbol_1.environment, frame_count)
+                    environment_stack.append(current_environment)
+                    current_environment = child
+
+                    stack.push(child)
+                    if pc >= 0:
+                        control.append((block, pc))
+                    control.append(child)
+                    block = control_structures[lambda_number]
+                    pc = len(block) - 1
+
+                # Rule 10
+                elif (type(stack_symbol_1) == Vector):
+                    stack.push(stack_symbol_1[stack_symbol_2 - 1])
+
+                # Rule 12
+                # A recursive function is nearly always a lambda that binds its own name and returns
+                # another lambda. Its closure is then created once, with the recursive name captured
+                # as the closure itself, so recursive calls are ordinary calls instead of unrolling an eta.
+                elif (stack_symbol_1 == "Y*"):
+                    body = control_structures[stack_symbol_2.number]
+                    if (len(body) == 1 and type(body[0]) == Lambda and stack_symbol_2.arity == 1):
+                        function = body[0]
+                        temp = Lambda(function.number)
+                        temp.bounded_variable = function.bounded_variable
+                        temp.parameters = function.parameters
+                        temp.arity = function.arity
+                        captured = stack_symbol_2.environment
+                        # The only parameter of the outer lambda is the recursive name.
+                        temp.environment = tuple([temp if type(capture) == Variable else captured[capture.slot]
+                                                  for capture in function.captures])
+                    else:
+                        temp = Eta(stack_symbol_2.number)
+                        temp.bounded_variable = stack_symbol_2.bounded_variable
+                        temp.parameters = stack_symbol_2.parameters
+                        temp.arity = stack_symbol_2.arity
+                        temp.environment = stack_symbol_2.environment
+                    stack.push(temp)
+
+                # Rule 13
+                elif (type(stack_symbol_1) == Eta):
+                    temp = Lambda(stack_symbol_1.number)
+                    temp.bounded_variable = stack_symbol_1.bounded_variable
+                    temp.parameters = stack_symbol_1.parameters
+                    temp.arity = stack_symbol_1.arity
+                    temp.environment = stack_symbol_1.environment
+
+                    if pc >= 0:
+                        control.append((block, pc))
+                    block = RECURSION_CONTROL
+                    pc = 1
+                    stack.push(stack_symbol_2)
+                    stack.push(stack_symbol_1)
+                    stack.push(temp)
+
+                # Built-in functions
+                elif stack_symbol_1 in builtInFunctions:
+                    self.built_in(stack_symbol_1, stack_symbol_2)
+
+                    # Conc takes both of its arguments at once, so the next symbol, the gamma that
+                    # would apply it to the second one, is skipped.
+                    if (stack_symbol_1 == "Conc"):
+                        if pc < 0:
+                            frame = control.pop()
+                            if type(frame) == tuple:
+                                block, pc = frame
+                        pc -= 1
+
+            # Rule 6
+            elif (symbol in BINARY_OPERATORS):
+                rand_1 = stack.pop()
+                rand_2 = stack.pop()
+                if (symbol is Opcode.ADD): 
                     stack.push(rand_1 + rand_2)
+                elif (symbol is Opcode.SUBTRACT):
+                    stack.push(rand_1 - rand_2)
+                elif (symbol is Opcode.MULTIPLY):
+                    stack.push(rand_1 * rand_2)
+                elif (symbol is Opcode.DIVIDE):
+                    stack.push(rand_1 // rand_2)
+                elif (symbol is Opcode.POWER):
+                    stack.push(rand_1 ** rand_2)
+                elif (symbol is Opcode.GR):
+                    stack.push(rand_1 > rand_2)
+                elif (symbol is Opcode.GE):
+                    stack.push(rand_1 >= rand_2)
+                elif (symbol is Opcode.LS):
+                    stack.push(rand_1 < rand_2)
+                elif (symbol is Opcode.LE):
+                    stack.push(rand_1 <= rand_2)
+                elif (symbol is Opcode.EQ):
+                    stack.push(rand_1 == rand_2)
+                elif (symbol is Opcode.NE):
+                    stack.push(rand_1 != rand_2)
+                elif (symbol is Opcode.OR):
+                    stack.push(rand_1 or rand_2)
+                elif (symbol is Opcode.AND):
+                    stack.push(rand_1 and rand_2)
+                elif (symbol is Opcode.AUG):
+                    stack.push(aug(rand_1, rand_2))
+
+            # Rule 7
+            elif (symbol in UNARY_OPERATORS):
+                rand = stack.pop()
+                if (symbol is Opcode.NOT):
+                    stack.push(not rand)
+                elif (symbol is Opcode.NEG):
+                    stack.push(-rand)
+
+            # Rule 8
+            elif (symbol is Opcode.BETA):
+                B = stack.pop()
+                else_part = block[pc]
+                then_part = block[pc - 1]
+                pc -= 2
+                if pc >= 0:
+                    control.append((block, pc))
+                if (B):
+                    block = control_structures[then_part.number]
                 else:
-                    stack.push(rand_1 + (rand_2,))
-
-        # Rule 7
-        elif (symbol in uop):
-            rand = stack.pop()
-            if (symbol == "not"):
-                stack.push(not rand)
-            elif (symbol == "neg"):
-                stack.push(-rand)
-
-        # Rule 8
-        elif (symbol == "beta"):
-            B = stack.pop()
-            else_part = control.pop()
-            then_part = control.pop()
-            if (B):
-                control += control_structures[then_part.number]
-            else:
-                control += control_structures[else_part.number]
-
-        # Rule 9
-        elif type(symbol) == Tau:
-            n = symbol.number
-            tau_list = []
-            for i in range(n):
-                tau_list.append(stack.pop())
-            tau_tuple = tuple(tau_list)
-            stack.push(tau_tuple)
-
-        elif (symbol == "Y*"):
-            stack.push(symbol)
-
-    # Lambda expression becomes a lambda closure when its environment is determined.
-    if type(stack[0]) == Lambda:
-        stack[0] = "[lambda closure: " + str(stack[0].bounded_variable) + ": " + str(stack[0].number) + "]"
-         
-    if type(stack[0]) == tuple:          
-        # The rpal.exe program prints the boolean values in lowercase. Our code must emulate this behaviour. 
-        for i in range(len(stack[0])):
-            if type(stack[0][i]) == bool:
-                stack[0] = list(stack[0])
-                stack[0][i] = str(stack[0][i]).lower()
-                stack[0] = tuple(stack[0])
-                
-        # The rpal.exe program does not print the comma when there is only one element in the tuple.
-        # Our code must emulate this behaviour.  
-        if len(stack[0]) == 1:
-            stack[0] = "(" + str(stack[0][0]) + ")"
-        
-        # The rpal.exe program does not print inverted commas when an element in the tuple is a string.
-        # Our code must emulate this behaviour too. 
-        else: 
-            if any(type(element) == str for element in stack[0]):
-                temp = "("
-                for element in stack[0]:
-                    temp += str(element) + ", "
-                temp = temp[:-2] + ")"
-                stack[0] = temp
-                
-    # The rpal.exe program prints the boolean values in lowercase. Our code must emulate this behaviour.    
-    if stack[0] == True or stack[0] == False:
-        stack[0] = str(stack[0]).lower()
-
-def parse_file(filename):
-    """Parse a file and return the AST"""
-    try:
-        with open(filename, 'r') as file:
-            code = file.read()
-    except FileNotFoundError:
-        print(f"Error: File '{filename}' not found.")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error reading file '{filename}': {e}")
-        sys.exit(1)
-    
-    # Lexical Analysis
-    lexer = Lexer(code)
-    tokens = lexer.tokenize()
-    
-    # Set up the token storage
-    token_storage = TokenStorage.get_instance()
-    token_storage.set_tokens(tokens)
-    
-    # Reset the parser state
-    Parser.node_stack = []
-    
-    # Parse the program
-    Parser.parse()
-    
-    # Get the AST
-    ast = Tree.get_instance().ast_root
-    return ast
-
-# The following function is called from the myrpal.py file.
-def get_result(file_name):
-    global control
-
-    ast = parse_file(file_name)
-    st = standardize(ast)
-
-    generate_control_structure(st,0) 
- 
-    control.append(environments[0].name)
-    control += control_structures[0]
-
-    stack.push(environments[0].name)
-
-    apply_rules()
-
-    if print_present:
-        print()
\ No newline at end of file
+                    block = control_structures[else_part.number]
+                pc = len(block) - 1
+
+            # Rule 9
+            elif type(symbol) == Tau:
+                n = symbol.number
+                tau_list = []
+                for i in range(n):
+                    tau_list.append(stack.pop())
+                tau_tuple = Vector(tau_list)
+                stack.push(tau_tuple)
+
+        self.current_environment = current_environment
+        self.frame_count = frame_count
+
+
+# The following function is called from the myrpal.py file with the pipeline of the program.
+def get_result(pipeline, output=None, statistics=None):
+    machine = CSEMachine(pipeline.control_structures, output, statistics)
+    result = machine.run()
+
+    if machine.print_present:
+        print(file=output)
+    return result
@@ -0,0 +1,63 @@
+"""
+Differential Testing of the Execution Engines
+Usage: python differential.py [file or directory ...]
+
+Runs every RPAL program with each execution engine and compares the output with
+the output of the CSE machine, which is the reference implementation. The
+programs in test_files are used when no files are given. The exit status is 1
+when any engine disagrees with the CSE machine.
+"""
+
+import os
+import subprocess
+import sys
+
+PYTHON = sys.executable
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(ROOT, "myrpal.py")
+
+REFERENCE = "cse"
+ENGINES = ["vm", "closure"]
+
+
+# The following function collects the programs from the given files and directories.
+def collect_programs(paths):
+    programs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.isfile(os.path.join(path, name)):
+                    programs.append(os.path.join(path, name))
+        else:
+            programs.append(path)
+    return programs
+
+
+# The following function runs a program with an engine and returns its exit status and output.
+def run_program(filename, engine):
+    result = subprocess.run([PYTHON, APP, "--no-cache", f"--engine={engine}", filename],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return result.returncode, result.stdout
+
+
+def main():
+    paths = sys.argv[1:] or [os.path.join(ROOT, "test_files")]
+    programs = collect_programs(paths)
+
+    failures = 0
+    for filename in programs:
+        expected = run_program(filename, REFERENCE)
+        mismatches = [engine for engine in ENGINES if run_program(filename, engine) != expected]
+        if mismatches:
+            failures += 1
+            print(f"FAIL {filename}: {', '.join(mismatches)} differ from {REFERENCE}")
+        else:
+            print(f"ok   {filename}")
+
+    print(f"{len(programs) - failures} of {len(programs)} programs agree across engines")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
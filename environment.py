@@ -1,15 +1,56 @@
-class Environment():
-    def __init__(self, number, parent):
-        self.name = "e_" + str(number)
-        self.parent = parent
-        self.variables = {}
-        self.children = []
-    
-    # This function adds a child to the current environment.    
-    def add_child(self, child):
-        self.children.append(child)
-        child.variables.update(self.variables)
-    
-    # This function adds a variable to the current environment.    
-    def add_variable(self, key, value):
-        self.variables[key] = value
\ No newline at end of file
+class Frame:
+    """
+    An environment of the CSE machine: the values bound by a lambda, in the order of its parameters,
+    and the values of the free variables captured by the closure that was called. A frame holds no
+    names and no parent; code finds a value by the slot of its variable. The CSE machine numbers its
+    frames in the order they are made, and a frame is shown as e_N like the environments of RPAL.
+    """
+    __slots__ = ("values", "captured", "number")
+
+    def __init__(self, values, captured, number=0):
+        self.values = values
+        self.captured = captured
+        self.number = number
+
+    # The following method is implemented for debugging purposes.
+    def __repr__(self):
+        return "e_" + str(self.number)
+
+class CountedFrame(Frame):
+    """A frame that is counted in the memory statistics of the run that made it."""
+    __slots__ = ("statistics",)
+
+    def __init__(self, values, captured, number, statistics):
+        Frame.__init__(self, values, captured, number)
+        self.statistics = statistics
+
+        statistics.created += 1
+        statistics.live += 1
+        if statistics.live > statistics.peak:
+            statistics.peak = statistics.live
+
+    def __del__(self):
+        self.statistics.live -= 1
+
+class MemoryStatistics:
+    """
+    Counts of the environments made by the runs it is given to (--mem-stats). Only the frames of those
+    runs are counted, so a run without statistics makes plain frames, and runs in the same process that
+    are given different statistics do not mix their counts.
+    """
+    def __init__(self):
+        self.created = 0
+        self.live = 0
+        self.peak = 0
+
+    # The following function makes a counted frame; engines call it in place of Frame.
+    def frame(self, values, captured, number=0):
+        return CountedFrame(values, captured, number, self)
+
+    # This function returns a report of the environments created during the execution.
+    def report(self):
+        return (
+            "Environments created: " + str(self.created) + "\n"
+            "Peak live environments: " + str(self.peak) + "\n"
+            "Live environments at exit: " + str(self.live)
+        )
@@ -0,0 +1,9 @@
+# This file contains the exception raised for errors in RPAL programs.
+
+
+class RPALError(Exception):
+    """
+    An error in the RPAL program being run, such as an undeclared identifier. The message is the
+    diagnostic that is shown to the user. The interpreter writes it to the output of the program and
+    raises the error again, so the program that runs the interpreter decides how to exit.
+    """
@@ -0,0 +1,60 @@
+"""
+Embeddable RPAL interpreter.
+
+An Interpreter runs programs with one of the execution engines and writes their
+output to a stream. Everything a program creates while it runs (tokens, trees,
+control structures and the state of the engine) belongs to that run, so a
+single process can evaluate any number of programs one after the other, and
+interpreters in different threads do not share any state.
+
+    interpreter = Interpreter(output=io.StringIO())
+    interpreter.run("Print (1 + 2)")
+
+The result of a run is the text of the value of the program, formatted the same
+way whatever engine ran it.
+
+Errors in a program, such as an undeclared identifier, are written to the output
+like the rest of it and raised as an RPALError. The interpreter never exits the
+process.
+"""
+
+import csemachine
+import vm
+import closure
+from errors import RPALError
+from pipeline import Pipeline
+from values import format_result
+
+# Execution engines. The CSE machine is the default and the reference implementation.
+ENGINES = {
+    "cse": csemachine.get_result,
+    "vm": vm.get_result,
+    "closure": closure.get_result,
+}
+
+
+class Interpreter:
+    """Runs RPAL programs with an execution engine and writes their output to a stream."""
+    def __init__(self, engine="cse", output=None, use_cache=True, statistics=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        self.engine = engine
+        self.output = output            # Stream for the output of the programs, stdout by default
+        self.use_cache = use_cache      # Whether programs read from files use the on-disk cache
+        self.statistics = statistics    # MemoryStatistics that count the environments of the runs, or None
+
+    def run(self, source):
+        """Run the source of a program and return the text of its result."""
+        return self.execute(Pipeline(source=source))
+
+    def run_file(self, filename):
+        """Run the program in a file and return the text of its result."""
+        return self.execute(Pipeline(filename, self.use_cache))
+
+    def execute(self, pipeline):
+        """Run a program whose front end is given as a pipeline and return the text of its result."""
+        try:
+            return format_result(ENGINES[self.engine](pipeline, self.output, self.statistics))
+        except RPALError as error:
+            print(error, file=self.output)
+            raise
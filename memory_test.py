@@ -0,0 +1,71 @@
+"""
+Memory Test of Tail Calls
+Usage: python memory_test.py
+
+Runs loops written as tail recursion 1,000,000 times with the engines that
+run tail calls in constant space, and checks that the peak resident memory of
+the interpreter stays within a fixed budget over the same loops run 1,000 times.
+The exit status is 1 when any engine goes over the budget.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+PYTHON = sys.executable
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(ROOT, "myrpal.py")
+
+# The loops make their tail call in the else part and in the then part of a conditional.
+PROGRAMS = ["let rec loop n = n eq 0 -> 'done' | loop (n - 1) in Print (loop {})\n",
+            "let rec loop n = n gr 0 -> loop (n - 1) | 'done' in Print (loop {})\n"]
+ITERATIONS = 1000000
+BUDGET = 8                              # MB a loop may add to the peak memory, whatever its length
+
+# The closure engine runs every call on the Python stack, so it is not tested here.
+ENGINES = ["cse", "vm"]
+
+
+# The following function runs a program with an engine and returns its output and the peak resident memory in MB.
+def run_program(source, engine):
+    handle, path = tempfile.mkstemp(suffix=".rpal", text=True)
+    with os.fdopen(handle, "w") as file:
+        file.write(source)
+    try:
+        process = subprocess.Popen([PYTHON, APP, "--no-cache", f"--engine={engine}", path],
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        output = process.stdout.read()
+        process.stdout.close()
+        # wait4 reports the resource usage of this child alone.
+        _, status, usage = os.wait4(process.pid, 0)
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(f"the interpreter failed: {output.strip()}")
+        return output, usage.ru_maxrss / 1024
+    finally:
+        os.remove(path)
+
+
+def main():
+    failures = 0
+    for number, program in enumerate(PROGRAMS, 1):
+        for engine in ENGINES:
+            _, short = run_program(program.format(1000), engine)
+            output, long = run_program(program.format(ITERATIONS), engine)
+            growth = long - short
+            if output.strip() != "done":
+                failures += 1
+                print(f"FAIL {engine} loop {number}: the loop printed {output.strip()!r}")
+            elif growth > BUDGET:
+                failures += 1
+                print(f"FAIL {engine} loop {number}: {ITERATIONS} iterations took {growth:.1f} MB more than 1000, "
+                      f"over the budget of {BUDGET} MB")
+            else:
+                print(f"ok   {engine} loop {number}: {ITERATIONS} iterations in {long:.1f} MB, {growth:.1f} MB more than 1000")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
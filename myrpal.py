@@ -1,31 +1,50 @@
 """
 RPAL Interpreter Main File
-Usage: python myrpal.py [-l] [-ast] [-st] filename
+Usage: python myrpal.py [-l] [-ast] [-st] [--dump-closures] [--mem-stats] [--no-cache] [--engine=cse|vm|closure] filename
+       python myrpal.py --batch [-j N] [--no-cache] [--engine=cse|vm|closure] directory|list
+       python myrpal.py --serve [-j N] [--socket=path] [--timeout=seconds]
+       python myrpal.py --client [--socket=path] [--timeout=seconds] [--engine=cse|vm|closure] filename
 """
 
 import sys
-from lexer import Lexer
-from parser import Parser, TokenStorage, Tree
-from csemachine import *
+from environment import MemoryStatistics
+from errors import RPALError
+from interpreter import Interpreter, ENGINES
+from pipeline import Pipeline
+from csemachine import describe_closures
 
+USAGE = ("python ./myrpal.py [-l] [-ast] [-st] [--dump-closures] [--mem-stats] [--no-cache] [--engine=cse|vm|closure] filename\n"
+         "python ./myrpal.py --batch [-j N] [--no-cache] [--engine=cse|vm|closure] directory|list\n"
+         "python ./myrpal.py --serve [-j N] [--socket=path] [--timeout=seconds]\n"
+         "python ./myrpal.py --client [--socket=path] [--timeout=seconds] [--engine=cse|vm|closure] filename")
 
+
+# The tree printers use an explicit stack instead of recursion, so deeply nested programs can be printed.
 def print_ast(node, dots=0):
-    if not node:
-        return
-    prefix = "." * dots
-    if hasattr(node, 'value') and node.value in {"nil", "true", "false", "dummy"}:
-        print(f"{prefix}<{node.value}>")
-    
-    elif hasattr(node, 'value') and node.value is not None:
-        print(f"{prefix}<{node.label}:{node.value}>")
-    else:
-        print(f"{prefix}{node.label}")
-    for child in node.children:
-        print_ast(child, dots + 1)
+    pending = [(node, dots)]
+    while pending:
+        node, dots = pending.pop()
+        if not node:
+            continue
+        # The AST shows the empty parameter list as <():>, the standardized tree as ().
+        print("." * dots + ("<():>" if node.value == "()" else str(node.value)))
+        for child in reversed(node.children):
+            pending.append((child, dots + 1))
 
 def print_st(node, dots=0):
-    if not node:
-        return
+    pending = [(node, dots)]
+    while pending:
+        node, dots = pending.pop()
+        if not node:
+            continue
+        print_st_node(node, dots)
+        
+        # Print children
+        if hasattr(node, 'children'):
+            for child in reversed(node.children):
+                pending.append((child, dots + 1))
+
+def print_st_node(node, dots):
     prefix = "." * dots
     
     # Handle Node objects (from standardizer) which only have 'value' attribute
@@ -43,133 +62,200 @@ def print_st(node, dots=0):
     # Fallback - just convert to string
     else:
         print(f"{prefix}{str(node)}")
-    
-    # Print children
-    if hasattr(node, 'children'):
-        for child in node.children:
-            print_st(child, dots + 1)
 
-def parse_file(filename):
-    """Parse a file and return the AST"""
+# The printers and the engines share one pipeline, so the file is read, parsed and standardized only once.
+def print_lexer_output(pipeline):
+    """Print lexer output (-l flag)"""
+    print(pipeline.source)
+
+def print_ast_output(pipeline):
+    """Print AST output (-ast flag)"""
+    print_ast(pipeline.ast)
+
+def print_st_output(pipeline):
+    """Print standardized tree output (-st flag)"""
+    print_st(pipeline.st)
+
+def print_closures_output(pipeline):
+    """Print the variables captured by the closures of every lambda (--dump-closures flag)"""
+    print(describe_closures(pipeline.control_structures))
+
+def execute_program(pipeline, engine="cse", statistics=None):
+    """Execute the program. Only the output of Print is shown, not the value of the program."""
     try:
-        with open(filename, 'r') as file:
-            code = file.read()
-    except FileNotFoundError:
-        print(f"Error: File '{filename}' not found.")
+        Interpreter(engine, statistics=statistics).execute(pipeline)
+    except RPALError:
+        # The interpreter has already printed the error.
         sys.exit(1)
     except Exception as e:
-        print(f"Error reading file '{filename}': {e}")
+        print(f"Error executing program: {e}")
         sys.exit(1)
-    
-    # Lexical Analysis
-    lexer = Lexer(code)
-    tokens = lexer.tokenize()
-    
-    # Set up the token storage
-    token_storage = TokenStorage.get_instance()
-    token_storage.set_tokens(tokens)
-    
-    # Reset the parser state
-    Parser.node_stack = []
-    
-    # Parse the program
-    Parser.parse()
-    
-    # Get the AST
-    ast = Tree.get_instance().ast_root
-    return ast
 
-def print_lexer_output(filename):
-    """Print lexer output (-l flag)"""
+def parse_options(switches, valid_switches):
+    """Return the engine, the number of jobs, the socket path and the timeout given by the switches"""
+    options = {"engine": "cse", "jobs": None, "socket": None, "timeout": None}
+    i = 0
+    while i < len(switches):
+        switch = switches[i]
+        if switch.startswith("--engine="):
+            options["engine"] = switch[len("--engine="):]
+            if options["engine"] not in ENGINES:
+                print_usage()
+        elif switch.startswith("--socket="):
+            options["socket"] = switch[len("--socket="):]
+        elif switch.startswith("--timeout="):
+            try:
+                options["timeout"] = float(switch[len("--timeout="):])
+            except ValueError:
+                print_usage()
+        elif switch == "-j" and i + 1 < len(switches) and switches[i + 1].isdigit():
+            options["jobs"] = int(switches[i + 1])
+            i += 1
+        elif switch.startswith("-j") and switch[2:].isdigit():
+            options["jobs"] = int(switch[2:])
+        elif switch not in valid_switches:
+            print_usage()
+        i += 1
+
+    if options["jobs"] == 0:
+        print_usage()
+    return options
+
+def execute_batch(switches, target):
+    """Run every program in a directory or list file on a pool of worker processes (--batch flag)"""
+    # The batch runner starts a pool of processes, so it is only imported when it is used.
+    from batch import collect_programs, run_batch
+
+    options = parse_options(switches, {"--batch", "--no-cache"})
+    engine = options["engine"]
+    jobs = options["jobs"]
+
     try:
-        with open(filename, 'r') as file:
-            code = file.read()
-            print(code)
-    except FileNotFoundError:
-        print(f"Error: File '{filename}' not found.")
+        filenames = collect_programs(target)
+    except OSError as e:
+        print(f"Error reading '{target}': {e}")
         sys.exit(1)
-    except Exception as e:
-        print(f"Error reading file '{filename}': {e}")
+
+    if run_batch(filenames, engine, "--no-cache" not in switches, jobs):
         sys.exit(1)
 
-def print_ast_output(filename):
-    """Print AST output (-ast flag)"""
-    ast = parse_file(filename)
-    print_ast(ast)
+def serve(switches):
+    """Run the interpreter server until it is interrupted (--serve flag)"""
+    import asyncio
+    from server import Server, DEFAULT_SOCKET, DEFAULT_TIMEOUT
 
-def print_st_output(filename):
-    """Print standardized tree output (-st flag)"""
-    ast = parse_file(filename)
-    st = standardize(ast)
-    print_st(st)
+    options = parse_options(switches, {"--serve"})
+    server = Server(options["socket"] or DEFAULT_SOCKET, options["jobs"], options["timeout"] or DEFAULT_TIMEOUT)
+    asyncio.run(server.serve())
+
+def execute_remote(switches, pipeline):
+    """Run the program on the interpreter server and print its output (--client flag)"""
+    from client import request, DEFAULT_SOCKET
 
-def execute_program(filename):
-    """Execute the program and print result"""
+    options = parse_options(switches, {"--client"})
     try:
-        ast = parse_file(filename)
-        st = standardize(ast)
-        result  = get_result(filename)
-        
-        if result is not None:
-            print(result)
-        
-    except Exception as e:
-        print(f"Error executing program: {e}")
+        output, status = request(pipeline.source, options["engine"], options["socket"] or DEFAULT_SOCKET, options["timeout"])
+    except OSError as e:
+        print(f"Error connecting to the server: {e}")
         sys.exit(1)
 
+    sys.stdout.write(output)
+    if status:
+        sys.exit(status)
+
+def print_usage():
+    """Print the command format and exit"""
+    print("Wrong command. Make sure the command is in the following format.")
+    print(USAGE)
+    sys.exit(1)
+
 def main():
     """Main function to handle command line arguments"""
     arguments = sys.argv
     
     if len(arguments) < 2:
-        print("Wrong command. Make sure the command is in the following format.")
-        print("python ./myrpal.py [-l] [-ast] [-st] filename")
-        sys.exit(1)
+        print_usage()
+
+    # The server takes no file name.
+    if "--serve" in arguments[1:]:
+        serve(arguments[1:])
+        return
     
     # Case 1: Only filename provided (execute program)
     if len(arguments) == 2:
-        filename = arguments[1]
-        execute_program(filename)
+        execute_program(Pipeline(arguments[1]))
         return
     
     # Case 2: Switches provided
     switches = arguments[1:-1]
-    filename = arguments[-1]
+    if "--batch" in switches:
+        execute_batch(switches, arguments[-1])
+        return
+    if "--client" in switches:
+        execute_remote(switches, Pipeline(arguments[-1]))
+        return
+
+    pipeline = Pipeline(arguments[-1], use_cache="--no-cache" not in switches)
     
     # Validate switches
-    valid_switches = {"-l", "-ast", "-st"}
+    valid_switches = {"-l", "-ast", "-st", "--dump-closures", "--mem-stats", "--no-cache"}
+    engine = None
     for switch in switches:
-        if switch not in valid_switches:
-            print("Wrong command. Make sure the command is in the following format.")
-            print("python ./myrpal.py [-l] [-ast] [-st] filename")
-            sys.exit(1)
+        if switch.startswith("--engine="):
+            engine = switch[len("--engine="):]
+            if engine not in ENGINES:
+                print_usage()
+        elif switch not in valid_switches:
+            print_usage()
     
     # Handle switches in order
     output_printed = False
     
     if "-l" in switches:
-        print_lexer_output(filename)
+        print_lexer_output(pipeline)
         output_printed = True
-        if len(switches) > 1:
+        if "-ast" in switches or "-st" in switches:
             print()  # Add newline between outputs
     
     if "-ast" in switches:
-        print_ast_output(filename)
+        print_ast_output(pipeline)
         output_printed = True
         if "-st" in switches:
             print()  # Add newline before ST output
     
     if "-st" in switches:
-        print_st_output(filename)
+        print_st_output(pipeline)
+        output_printed = True
+        if "--dump-closures" in switches:
+            print()  # Add newline before the closures
+
+    if "--dump-closures" in switches:
+        print_closures_output(pipeline)
         output_printed = True
 
-    execute_program(filename)
+    # Selecting an engine or disabling the cache counts as a switch since the program is executed with it.
+    if engine is not None or "--no-cache" in switches:
+        output_printed = True
+    if engine is None:
+        engine = "cse"
+
+    # Environments are only counted when the memory report is asked for.
+    statistics = MemoryStatistics() if "--mem-stats" in switches else None
+    execute_program(pipeline, engine, statistics)
+
+    # The memory report goes to stderr so that it does not mix with the program output.
+    if statistics:
+        print(statistics.report(), file=sys.stderr)
+        output_printed = True
     
     # If any switch was used, don't execute the program
     if not output_printed:
-        print("Wrong command. Make sure the command is in the following format.")
-        print("python ./myrpal.py [-l] [-ast] [-st] filename")
-        sys.exit(1)
+        print_usage()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # A program file that cannot be read is reported here when a printer or the client reads it first.
+    try:
+        main()
+    except RPALError as e:
+        print(e)
+        sys.exit(1)
\ No newline at end of file
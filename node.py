@@ -1,17 +1,24 @@
 class Node:
-    def __init__(self, value):
-        self.level = 0
+    """
+    A node of the abstract syntax tree, which the standardizer rewrites into the standardized tree.
+    The value is the label of the node as it is printed, such as "lambda", "<ID:x>" or "<INT:5>".
+    """
+    __slots__ = ("value", "children")
+
+    def __init__(self, value, children=None):
         self.value = value
-        self.children = []  
-        
+        self.children = [] if children is None else children
+
 
-# Recursively traverse each child nodes
+# Traverse each child node, using an explicit stack instead of recursion
 def preorder_traversal(root):
-    if root is None:
-        return
+    pending = [(root, 0)]
+    while pending:
+        root, level = pending.pop()
+        if root is None:
+            continue
+
+        print("." * level + root.value)
 
-    print("." * root.level + root.value)
-    
-    for child in root.children:
-        child.level = root.level + 1
-        preorder_traversal(child)  
\ No newline at end of file
+        for child in reversed(root.children):
+            pending.append((child, level + 1))
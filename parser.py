@@ -1,688 +1,534 @@
-from enum import Enum
-from typing import List, Optional, Union
-
-#keywords = [
-#    "let", "in", "fn", "where", "rec", "and", "aug","within", "eq","ls"
-#]
-keywords = [
-        "let", "in", "where", "rec", "fn", "aug", "or", "not",
-        "gr", "ge", "ls", "le", "eq", "ne", 
-         "within", "and"
-    ]
-
-class TokenType(str,Enum):
-    """Enum representing the types of tokens in the RPAL language."""
-    IDENTIFIER = "IDENTIFIER"
-    INTEGER = "INTEGER"
-    STRING = "STRING"
-    OPERATOR = "OPERATOR"
-    #KEYWORD = "KEYWORD"
-    END_OF_FILE = "EOF"
-    #PUNCTUATION = "PUNCTUATION"
-
-
-class Token:
-    """Class representing a token in the RPAL language."""
-    def __init__(self, token_type: TokenType, value: str):
-        self.type = token_type
-        self.value = value
-
-
-class TreeNode:
-    """Base class for nodes in the Abstract Syntax Tree."""
-    def __init__(self, label: str):
-        self.label = label
-        self.children = []
-
-    def append_child(self, child):
-        """Add a child node to this node."""
-        self.children.append(child)
-
-    def reverse_children_order(self):
-        """Reverse the order of children."""
-        self.children.reverse()
-
-
-class LeafNode(TreeNode):
-    """Class representing a leaf node in the Abstract Syntax Tree."""
-    def __init__(self, label: str, value: str = ""):
-        super().__init__(label)
-        self.value = value
-    
-    def get_value(self):
-        return self.value  # or value if that’s what your factory expects
-
-    def get_children(self):
-        return self.children
-    def get_label(self):
-        return self.label
-
-
-class InternalNode(TreeNode):
-    """Class representing an internal node in the Abstract Syntax Tree."""
-    pass
-
-
-'''class Lexer:
-    """Simple lexer class for demonstration purposes."""
-    def __init__(self, source: str):
-        self.source = source
-        self.position = 0
-        self.tokens = []
-        self.tokenize()
-
-    def tokenize(self):
-        """Tokenize the source code. Simplified for this example."""
-        # This is a placeholder implementation
-        # A real implementation would scan the source and produce tokens
-        pass'''
-
-
-class TokenStorage:
-    """Singleton class for storing and accessing tokens."""
-    _instance = None
-
-    @classmethod
-    def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = TokenStorage()
-        return cls._instance
-
-    def __init__(self):
-        self.tokens = []
-        self.position = 0
-
-    def set_tokens(self, tokens: List[Token]):
-        """Set the tokens list."""
-        self.tokens = tokens
-        self.position = 0
-
-    def top(self) -> Token:
-        """Return the current token without consuming it."""
-        if self.position < len(self.tokens):
-            return self.tokens[self.position]
-        return Token(TokenType.END_OF_FILE, "")
-
-    def pop(self) -> Token:
-        """Return the current token and advance to the next one."""
-        token = self.top()
-        self.position += 1
-        return token
-
-
-class Tree:
-    """Singleton class representing the Abstract Syntax Tree."""
-    _instance = None
-
-    @classmethod
-    def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = Tree()
-        return cls._instance
-
-    def __init__(self):
-        self.ast_root = None
-
-    def set_ast_root(self, root: TreeNode):
-        """Set the root of the AST."""
-        self.ast_root = root
-
-
-class Parser:
-    """The Parser class is responsible for parsing a sequence of tokens and constructing the AST."""
-    node_stack = []
-
-    @staticmethod
-    def parse():
-        """Parse the input tokens and construct the AST."""
-        token_storage = TokenStorage.get_instance()
-        token = token_storage.top()
-
-        # Check if the input token is the end of file token
-        if token.type == TokenType.END_OF_FILE:
-            return  # No further parsing required
-        else:
-            E()  # Start parsing the expression
-
-            # Check if the next token is the end of file token
-            if token_storage.top().type == TokenType.END_OF_FILE:
-                # Set the root of the AST to the last node in the node_stack
-                Tree.get_instance().set_ast_root(Parser.node_stack[-1])
-                return  # Parsing completed
-            else:
-                raise SyntaxError("End of file expected")
-
-
-def build_tree(label: str, num: int, is_leaf: bool, node_value: str = ""):
-    """
-    Construct a new TreeNode with the specified label, number of children, leaf status, and node_value.
-    Add the constructed node to the node_stack.
-    """
-    if is_leaf:
-        node = LeafNode(label, node_value)
-    else:
-        node = InternalNode(label)
-
-    # Add the children from the node_stack to the newly created node
-    for _ in range(num):
-        node.append_child(Parser.node_stack.pop())
-
-    # Reverse the order of the children
-    node.reverse_children_order()
-
-    # Push the constructed node onto the node_stack
-    Parser.node_stack.append(node)
-
-
-def E():
-    """
-    Parse the expression starting with E.
-    Handles the grammar rule E -> "let" D "in" E | "fn" Vb+  "." E | Ew.
-    """
-    token_storage = TokenStorage.get_instance()
-
-    # Check if the current token is "let"
-    if token_storage.top().value == "let":
-        token_storage.pop()
-        D()
-
-        # Check if the next token is "in"
-        if token_storage.top().value == "in":
-            token_storage.pop()
-            E()
-        else:
-            raise SyntaxError("'in' expected")
-
-        # Build the "let" node with 2 children
-        build_tree("let", 2, False)
-    # Check if the current token is "fn"
-    elif token_storage.top().value == "fn":
-        token_storage.pop()
-        n = 0
-
-        # Process identifiers until a non-identifier token is encountered
-        while (token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords) or token_storage.top().value == "(":
-            Vb()
-            n += 1
-
-        if n == 0:
-            raise SyntaxError("At least one identifier expected")
-
-        # Check if the next token is "."
-        if token_storage.top().value == ".":
-            token_storage.pop()
-            E()
-        else:
-            raise SyntaxError("'.' expected")
-
-        # Build the "lambda" node with n+1 children
-        build_tree("lambda", n + 1, False)
-    else:
-        Ew()
-
-
-def Ew():
-    """
-    Parse the expression starting with Ew.
-    Handles the grammar rule Ew -> T [ "where" Dr ].
-    """
-    token_storage = TokenStorage.get_instance()
-    T()
-
-    # Check if the next token is "where"
-    if token_storage.top().value == "where":
-        token_storage.pop()
-        Dr()
-        build_tree("where", 2, False)
-
-
-def T():
-    """
-    Parse the expression starting with T.
-    Handles the grammar rule T -> Ta { "," Ta }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Ta()
-    n = 0
-
-    # Process additional T expressions separated by commas
-    while token_storage.top().value == ",":
-        token_storage.pop()
-        Ta()
-        n += 1
-
-    if n > 0:
-        build_tree("tau", n + 1, False)
-
-
-def Ta():
-    """
-    Parse the expression starting with Ta.
-    Handles the grammar rule Ta -> Tc { "aug" Tc }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Tc()
-
-    # Process additional Tc expressions separated by "aug" keyword
-    while token_storage.top().value == "aug":
-        token_storage.pop()
-        Tc()
-        build_tree("aug", 2, False)
-
-
-def Tc():
-    """
-    Parse the expression starting with Tc.
-    Handles the grammar rule Tc -> B [ "->" Tc [ "|" Tc ] ].
-    """
-    token_storage = TokenStorage.get_instance()
-    B()
-
-    # Check if the next token is "->"
-    if token_storage.top().value == "->":
-        token_storage.pop()
-        Tc()
-
-        # Check if the next token is "|"
-        if token_storage.top().value == "|":
-            token_storage.pop()
-            Tc()
-            build_tree("->", 3, False)
-        else:
-            raise SyntaxError("'|' expected")
-
-
-def B():
-    """
-    Parse the expression starting with B.
-    Handles the grammar rule B -> Bt { "or" Bt }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Bt()
-
-    # Process additional Bt expressions separated by "or" keyword
-    while token_storage.top().value == "or":
-        token_storage.pop()
-        Bt()
-        build_tree("or", 2, False)
-
-
-def Bt():
-    """
-    Parse the expression starting with Bt.
-    Handles the grammar rule Bt -> Bs { "&" Bs }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Bs()
-
-    # Process additional Bs expressions separated by "&" keyword
-    while token_storage.top().value == "&":
-        token_storage.pop()
-        Bs()
-        build_tree("&", 2, False)
-
-
-def Bs():
-    """
-    Parse the expression starting with Bs.
-    Handles the grammar rule Bs -> "not" Bp | Bp.
-    """
-    token_storage = TokenStorage.get_instance()
-    if token_storage.top().value == "not":
-        token_storage.pop()
-        Bp()
-        build_tree("not", 1, False)
-    else:
-        Bp()
-
-
-def Bp():
-    """
-    Parse the expression starting with Bp.
-    Handles the grammar rule Bp -> A { comparison_operator A }.
-    """
-    token_storage = TokenStorage.get_instance()
-    A()
-
-    # Check for comparison operators
-    if token_storage.top().value in ["gr", ">"]:
-        token_storage.pop()
-        A()
-        build_tree("gr", 2, False)
-    elif token_storage.top().value in ["ge", ">="]:
-        token_storage.pop()
-        A()
-        build_tree("ge", 2, False)
-    elif token_storage.top().value in ["ls", "<"]:
-        token_storage.pop()
-        A()
-        build_tree("ls", 2, False)
-    elif token_storage.top().value in ["le", "<="]:
-        token_storage.pop()
-        A()
-        build_tree("le", 2, False)
-    elif token_storage.top().value in ["eq", "="]:
-        token_storage.pop()
-        A()
-        build_tree("eq", 2, False)
-    elif token_storage.top().value in ["ne", "!="]:
-        token_storage.pop()
-        A()
-        build_tree("ne", 2, False)
-
-
-def A():
-    """
-    Parse the expression starting with A.
-    Handles the grammar rule A -> + At | - At | At { + At | - At }.
-    """
-    token_storage = TokenStorage.get_instance()
-
-    # Check for unary plus operator
-    if token_storage.top().value == "+":
-        token_storage.pop()
-        At()
-    # Check for unary minus operator
-    elif token_storage.top().value == "-":
-        token_storage.pop()
-        At()
-        build_tree("neg", 1, False)
-    else:
-        At()
-
-    # Check for addition and subtraction operators
-    while token_storage.top().value in ["+", "-"]:
-        if token_storage.top().value == "+":
-            token_storage.pop()
-            At()
-            build_tree("+", 2, False)
-        elif token_storage.top().value == "-":
-            token_storage.pop()
-            At()
-            build_tree("-", 2, False)
-
-
-def At():
-    """
-    Parse the expression starting with At.
-    Handles the grammar rule At -> Af { * Af | / Af }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Af()
-
-    # Check for multiplication and division operators
-    while token_storage.top().value in ["*", "/"]:
-        if token_storage.top().value == "*":
-            token_storage.pop()
-            Af()
-            build_tree("*", 2, False)
-        elif token_storage.top().value == "/":
-            token_storage.pop()
-            Af()
-            build_tree("/", 2, False)
-
-
-def Af():
-    """
-    Parse the expression starting with Af.
-    Handles the grammar rule Af -> Ap { ** Ap }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Ap()
-
-    # Check for exponentiation operator
-    while token_storage.top().value == "**":
-        token_storage.pop()
-        Ap()
-        build_tree("**", 2, False)
-
-
-def Ap():
-    """
-    Parse the expression starting with Ap.
-    Handles the grammar rule Ap -> R { @ identifier R }.
-    """
-    token_storage = TokenStorage.get_instance()
-    R()
-
-    # Check for function application operator
-    while token_storage.top().value == "@":
-        token_storage.pop()
-
-        # Check for identifier token
-        if token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords:
-            token = token_storage.pop()
-            build_tree("ID", 0, True, token.value)
-        else:
-            raise SyntaxError("Identifier expected")
-
-        R()
-        build_tree("@", 3, False)
-
-
-def R():
-    """
-    Parse the expression starting with R.
-    Handles the grammar rule R -> Rn { Rn }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Rn()
-
-    top = token_storage.top()
-    valid_types = [TokenType.IDENTIFIER, TokenType.INTEGER, TokenType.STRING]
-    valid_values = ["true", "false", "nil", "(", "dummy"]
-    
-    while (top.type in valid_types or top.value in valid_values) and top.value not in keywords:
-        Rn()
-        top = token_storage.top()
-        build_tree("gamma", 2, False)
-
-
-def Rn():
-    """
-    Parse the expression starting with Rn.
-    Handles the grammar rule Rn -> identifier | integer | string | true | false | nil | ( E ) | dummy.
-    """
-    token_storage = TokenStorage.get_instance()
-    top = token_storage.top()
-
-    if top.type == TokenType.IDENTIFIER and top.value not in keywords:
-        # Parse Identifier
-        token = token_storage.pop()
-        build_tree("ID", 0, True, token.value)
-    elif top.type == TokenType.INTEGER:
-        # Parse Integer
-        token = token_storage.pop()
-        build_tree("INT", 0, True, token.value)
-    elif top.type == TokenType.STRING:
-        # Parse String
-        token = token_storage.pop()
-        build_tree("STR", 0, True, token.value)
-    elif top.value == "true":
-        # Parse true
-        token_storage.pop()
-        build_tree("true", 0, True)
-    elif top.value == "false":
-        # Parse false
-        token_storage.pop()
-        build_tree("false", 0, True)
-    elif top.value == "nil":
-        # Parse nil
-        token_storage.pop()
-        build_tree("nil", 0, True)
-    elif top.value == "(":
-        token_storage.pop()
-        E()
-        if token_storage.top().value == ")":
-            token_storage.pop()
-        else:
-            raise SyntaxError("')' expected")
-    elif top.value == "dummy":
-        # Parse dummy
-        token_storage.pop()
-        build_tree("dummy", 0, True)
-    else:
-        raise SyntaxError(f"Identifier, Integer, String, 'true', 'false', 'nil', '(', 'dummy' expected, got: {top.value}")
-
-
-def D():
-    """
-    Parse the expression starting with D.
-    Handles the grammar rule D -> Da [ within D ].
-    """
-    token_storage = TokenStorage.get_instance()
-    Da()
-
-    while token_storage.top().value == "within":
-        token_storage.pop()
-        D()
-        build_tree("within", 2, False)
-
-
-def Da():
-    """
-    Parse the expression starting with Da.
-    Handles the grammar rule Da -> Dr { and Dr }.
-    """
-    token_storage = TokenStorage.get_instance()
-    Dr()
-    n = 0
-
-    while token_storage.top().value == "and":
-        token_storage.pop()
-        Dr()
-        n += 1
-        
-    if n > 0:
-        build_tree("and", n + 1, False)
-
-
-def Dr():
-    """
-    Parse the expression starting with Dr.
-    Handles the grammar rule Dr -> rec Db | Db.
-    """
-    token_storage = TokenStorage.get_instance()
-
-    if token_storage.top().value == "rec":
-        token_storage.pop()
-        Db()
-        build_tree("rec", 1, False)
-    else:
-        Db()
-
-
-def Db():
-    """
-    Parse the expression starting with Db.
-    Handles the grammar rule Db -> ( D ) | identifier Vl = E | Vb { , Vb } = E | epsilon.
-    """
-    token_storage = TokenStorage.get_instance()
-
-    if token_storage.top().value == "(":
-        token_storage.pop()
-        D()
-
-        if token_storage.top().value == ")":
-            token_storage.pop()
-        else:
-            raise SyntaxError("')' expected")
-    elif token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords:
-        # Parse Identifier
-        token = token_storage.pop()
-        build_tree("ID", 0, True, token.value)
-
-        if token_storage.top().value == ",":
-            token_storage.pop()
-            Vl()
-
-            if token_storage.top().value == "=":
-                token_storage.pop()
-                E()
-                build_tree("=", 2, False)
-            else:
-                raise SyntaxError("'=' expected")
-        else:
-            n = 0
-
-            while token_storage.top().value != "=" and token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords:
-                Vb()
-                n += 1
-
-            if token_storage.top().value == "(":
-                Vb()
-                n += 1
-
-            if n == 0 and token_storage.top().value == "=":
-                token_storage.pop()
-                E()
-                build_tree("=", 2, False)
-            elif n != 0 and token_storage.top().value == "=":
-                token_storage.pop()
-                E()
-                build_tree("fcn_form", n + 2, False)
-            else:
-                raise SyntaxError("'=' expected")
-    else:
-        raise SyntaxError("'(' or Identifier expected")
-
-
-def Vb():
-    """
-    Parse the expression starting with Vb.
-    Handles the grammar rule Vb -> identifier | ( ) | ( identifier Vl ).
-    """
-    token_storage = TokenStorage.get_instance()
-
-    if token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords:
-        # Parse Identifier
-        token = token_storage.pop()
-        build_tree("ID", 0, True, token.value)
-    elif token_storage.top().value == "(":
-        token_storage.pop()
-
-        if token_storage.top().value == ")":
-            token_storage.pop()
-            build_tree("()", 0, True)
-        elif token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords:
-            # Parse Identifier
-            token = token_storage.pop()
-            build_tree("ID", 0, True, token.value)
-
-            if token_storage.top().value == ",":
-                token_storage.pop()
-                Vl()
-
-            if token_storage.top().value == ")":
-                token_storage.pop()
-            else:
-                raise SyntaxError("')' expected")
-        else:
-            raise SyntaxError("Identifier or ')' expected")
-    else:
-        raise SyntaxError("Identifier or '(' expected")
-
-
-def Vl():
-    """
-    Parse the expression starting with Vl.
-    Handles the grammar rule Vl -> identifier { , identifier }.
-    """
-    token_storage = TokenStorage.get_instance()
-
-    if token_storage.top().type == TokenType.IDENTIFIER and token_storage.top().value not in keywords:
-        # Parse Identifier
-        token = token_storage.pop()
-        build_tree("ID", 0, True, token.value)
-
-        n = 2
-        while token_storage.top().value == ",":
-            token_storage.pop()
-            token = token_storage.pop()
-            build_tree("ID", 0, True, token.value)
-            n += 1
-
-        build_tree(",", n, False)
-    else:
-        raise SyntaxError("Identifier expected")
-
+from collections import deque
+from typing import Iterable, Optional
+from lexer import *
+from node import Node
+
+# Binding levels of the operators in B, from the loosest to the tightest
+OR_LEVEL, AND_LEVEL, NOT_LEVEL, COMPARISON_LEVEL, ADD_LEVEL, MULTIPLY_LEVEL, POWER_LEVEL, AT_LEVEL = range(1, 9)
+
+# Label and level of the node built for each binary operator, by the kind of the operator or keyword
+BINARY_OPERATORS = {
+    KIND_OR: ("or", OR_LEVEL),
+    KIND_AMPERSAND: ("&", AND_LEVEL),
+    KIND_GR: ("gr", COMPARISON_LEVEL), KIND_GREATER: ("gr", COMPARISON_LEVEL),
+    KIND_GE: ("ge", COMPARISON_LEVEL), KIND_GREATER_EQUAL: ("ge", COMPARISON_LEVEL),
+    KIND_LS: ("ls", COMPARISON_LEVEL), KIND_LESS: ("ls", COMPARISON_LEVEL),
+    KIND_LE: ("le", COMPARISON_LEVEL), KIND_LESS_EQUAL: ("le", COMPARISON_LEVEL),
+    KIND_EQ: ("eq", COMPARISON_LEVEL), KIND_EQUALS: ("eq", COMPARISON_LEVEL),
+    KIND_NE: ("ne", COMPARISON_LEVEL), KIND_NOT_EQUAL: ("ne", COMPARISON_LEVEL),
+    KIND_PLUS: ("+", ADD_LEVEL), KIND_MINUS: ("-", ADD_LEVEL),
+    KIND_TIMES: ("*", MULTIPLY_LEVEL), KIND_DIVIDE: ("/", MULTIPLY_LEVEL),
+    KIND_POWER: ("**", POWER_LEVEL),
+    KIND_AT: ("@", AT_LEVEL),
+}
+
+# Values of the identifiers that name literals; every other identifier becomes an <ID:name> node
+LITERAL_NAMES = {"true": "<true>", "false": "<false>", "nil": "<nil>", "dummy": "<dummy>"}
+
+# Kinds of the tokens an Rn starts with, and of the tokens that are an Rn on their own
+RN_START = frozenset([KIND_IDENTIFIER, KIND_INTEGER, KIND_STRING, KIND_OPEN])
+LEAF_KINDS = frozenset([KIND_IDENTIFIER, KIND_INTEGER, KIND_STRING])
+
+
+# The token the parser sees once the tokens run out. Token is the token type of lexer.py.
+END_OF_FILE = Token("EOF", "", KIND_END)
+
+
+# The following function returns the leaf for an identifier.
+def identifier_node(name):
+    return Node(LITERAL_NAMES.get(name) or f"<ID:{name}>")
+
+
+class TokenStorage:
+    """
+    Class for storing and accessing the tokens of a program.
+    The tokens are taken from an iterator only when the parser looks at them, so a lexer that yields
+    tokens runs alongside the parser. Only the tokens looked ahead at are kept, at most `lookahead`.
+    """
+    def __init__(self, tokens: Iterable[Token] = (), lookahead: int = 1):
+        self.lookahead = lookahead
+        self.set_tokens(tokens)
+
+    def set_tokens(self, tokens: Iterable[Token]):
+        """Set the tokens, as a list or any other iterable."""
+        self.tokens = iter(tokens)
+        self.buffer = deque()
+        self.position = 0               # Number of tokens consumed
+
+    def peek(self, offset: int = 0) -> Token:
+        """Return the token the given number of places after the current one without consuming it."""
+        if not 0 <= offset < self.lookahead:
+            raise IndexError(f"Lookahead is limited to {self.lookahead} tokens")
+        while len(self.buffer) <= offset:
+            token = next(self.tokens, None)
+            if token is None:
+                return END_OF_FILE
+            self.buffer.append(token)
+        return self.buffer[offset]
+
+    def top(self) -> Token:
+        """Return the current token without consuming it."""
+        if self.buffer:
+            return self.buffer[0]
+        return self.peek()
+
+    def pop(self) -> Token:
+        """Return the current token and advance to the next one."""
+        token = self.top()
+        if self.buffer:
+            self.buffer.popleft()
+        self.position += 1
+        return token
+
+
+class Parser:
+    """
+    The Parser class is responsible for parsing a sequence of tokens and constructing the AST.
+    Every grammar function returns the node it parsed, so the tree is built directly without a node stack.
+    Every parser has its own tokens, so several programs can be parsed at the same time.
+
+    The grammar functions that can nest are generators. Instead of calling another grammar function,
+    one yields the generator of that function and receives the node it parsed, and run keeps the
+    generators that are waiting on a stack of its own. Deeply nested programs therefore do not hit
+    the recursion limit of Python.
+    """
+    def __init__(self, tokens: Iterable[Token]):
+        self.token_storage = TokenStorage(tokens)
+
+    def parse(self) -> Optional[Node]:
+        """Parse the input tokens and return the root of the AST."""
+        token_storage = self.token_storage
+        token = token_storage.top()
+
+        # Check if the input token is the end of file token
+        if token.kind == KIND_END:
+            return None  # No further parsing required
+        else:
+            root = self.run(self.E())  # Start parsing the expression
+
+            # Check if the next token is the end of file token
+            if token_storage.top().kind == KIND_END:
+                return root  # Parsing completed
+            else:
+                raise SyntaxError("End of file expected")
+
+    def run(self, goal) -> Node:
+        """Run a grammar function, and the grammar functions it yields, and return the node it parsed."""
+        # The stack holds the send methods of the generators, which resume them with the node they wait for.
+        pending = [goal.send]
+        push = pending.append
+        pop = pending.pop
+        send = goal.send
+        node = None
+        while True:
+            try:
+                call = send(node)
+            except StopIteration as stop:
+                pop()
+                if not pending:
+                    return stop.value
+                send = pending[-1]
+                node = stop.value
+            else:
+                send = call.send
+                push(send)
+                node = None
+
+    def E(self) -> Node:
+        """
+        Parse the expression starting with E.
+        Handles the grammar rule E -> "let" D "in" E | "fn" Vb+  "." E | Ew.
+        """
+        token_storage = self.token_storage
+
+        # Check if the current token is "let"
+        if token_storage.top().kind == KIND_LET:
+            token_storage.pop()
+            definition = (yield self.D())
+
+            # Check if the next token is "in"
+            if token_storage.top().kind == KIND_IN:
+                token_storage.pop()
+                body = (yield self.E())
+            else:
+                raise SyntaxError("'in' expected")
+
+            return Node("let", [definition, body])
+        # Check if the current token is "fn"
+        elif token_storage.top().kind == KIND_FN:
+            token_storage.pop()
+            children = []
+
+            # Process identifiers until a non-identifier token is encountered
+            while token_storage.top().kind in (KIND_IDENTIFIER, KIND_OPEN):
+                children.append(self.Vb())
+
+            if not children:
+                raise SyntaxError("At least one identifier expected")
+
+            # Check if the next token is "."
+            if token_storage.top().kind == KIND_DOT:
+                token_storage.pop()
+                children.append((yield self.E()))
+            else:
+                raise SyntaxError("'.' expected")
+
+            return Node("lambda", children)
+        else:
+            return (yield self.Ew())
+
+
+    def Ew(self) -> Node:
+        """
+        Parse the expression starting with Ew.
+        Handles the grammar rule Ew -> T [ "where" Dr ].
+        """
+        token_storage = self.token_storage
+        node = (yield self.T())
+
+        # Check if the next token is "where"
+        if token_storage.top().kind == KIND_WHERE:
+            token_storage.pop()
+            node = Node("where", [node, (yield self.Dr())])
+        return node
+
+
+    def T(self) -> Node:
+        """
+        Parse the expression starting with T.
+        Handles the grammar rule T -> Ta { "," Ta }.
+        """
+        token_storage = self.token_storage
+        node = (yield self.Ta())
+
+        # Process additional T expressions separated by commas
+        if token_storage.top().kind == KIND_COMMA:
+            children = [node]
+            while token_storage.top().kind == KIND_COMMA:
+                token_storage.pop()
+                children.append((yield self.Ta()))
+            node = Node("tau", children)
+        return node
+
+
+    def Ta(self) -> Node:
+        """
+        Parse the expression starting with Ta.
+        Handles the grammar rule Ta -> Tc { "aug" Tc }.
+        """
+        token_storage = self.token_storage
+        node = (yield self.Tc())
+
+        # Process additional Tc expressions separated by "aug" keyword
+        while token_storage.top().kind == KIND_AUG:
+            token_storage.pop()
+            node = Node("aug", [node, (yield self.Tc())])
+        return node
+
+
+    def Tc(self) -> Node:
+        """
+        Parse the expression starting with Tc.
+        Handles the grammar rule Tc -> B [ "->" Tc [ "|" Tc ] ].
+        """
+        token_storage = self.token_storage
+        node = (yield self.B())
+
+        # Check if the next token is "->"
+        if token_storage.top().kind == KIND_ARROW:
+            token_storage.pop()
+            then_node = (yield self.Tc())
+
+            # Check if the next token is "|"
+            if token_storage.top().kind == KIND_BAR:
+                token_storage.pop()
+                node = Node("->", [node, then_node, (yield self.Tc())])
+            else:
+                raise SyntaxError("'|' expected")
+        return node
+
+
+    def B(self, level: int = OR_LEVEL, first: Optional[Node] = None) -> Node:
+        """
+        Parse the operator expressions B, Bt, Bs, Bp, A, At, Af and Ap by precedence climbing.
+        Handles the grammar rules
+            B -> Bt { "or" Bt }             Bt -> Bs { "&" Bs }             Bs -> "not" Bp | Bp
+            Bp -> A [ comparison_operator A ]
+            A -> + At | - At | At { + At | - At }
+            At -> Af { * Af | / Af }        Af -> Ap { ** Ap }              Ap -> R { @ identifier R }.
+        Only the operators that bind at least as tightly as `level` are parsed, so B(MULTIPLY_LEVEL) parses an At.
+        The first single-token Rn is passed as `first` when it has already been parsed.
+        """
+        token_storage = self.token_storage
+        kind = token_storage.top().kind
+
+        # left_level is the level of the expression parsed so far. An operator only takes it as its left
+        # operand if it binds at most as tightly; comparisons do not chain, so they need a tighter one.
+        if first is not None:
+            node = first
+            if kind in RN_START:
+                node = (yield self.R(node))
+            left_level = AT_LEVEL
+        elif kind == KIND_NOT and level <= NOT_LEVEL:
+            token_storage.pop()
+            node = Node("not", [(yield self.B(COMPARISON_LEVEL))])
+            left_level = NOT_LEVEL
+        elif (kind == KIND_PLUS or kind == KIND_MINUS) and level <= ADD_LEVEL:
+            # The sign applies to the first At only
+            token_storage.pop()
+            node = (yield self.B(MULTIPLY_LEVEL))
+            if kind == KIND_MINUS:
+                node = Node("neg", [node])
+            left_level = ADD_LEVEL
+        elif kind == KIND_OPEN:
+            node = (yield self.R())
+            left_level = AT_LEVEL
+        else:
+            # Most operands are a single token, which is parsed without starting R.
+            node = self.Rl()
+            if token_storage.top().kind in RN_START:
+                node = (yield self.R(node))
+            left_level = AT_LEVEL
+
+        while True:
+            operator = BINARY_OPERATORS.get(token_storage.top().kind)
+            if operator is None:
+                break
+            label, operator_level = operator
+            if operator_level < level or operator_level > left_level or operator_level == left_level == COMPARISON_LEVEL:
+                break
+            token_storage.pop()
+            left_level = operator_level
+
+            if operator_level == AT_LEVEL:
+                # Check for identifier token
+                if token_storage.top().kind == KIND_IDENTIFIER:
+                    function = identifier_node(token_storage.pop().value)
+                else:
+                    raise SyntaxError("Identifier expected")
+                node = Node("@", [node, function, (yield self.R())])
+            elif token_storage.top().kind in LEAF_KINDS:
+                # Most right operands are a single token that the next operator does not take,
+                # which is parsed without starting B.
+                right = self.Rl()
+                kind = token_storage.top().kind
+                following = BINARY_OPERATORS.get(kind)
+                if kind in RN_START or (following is not None and following[1] > operator_level):
+                    right = (yield self.B(operator_level + 1, right))
+                node = Node(label, [node, right])
+            else:
+                # All the operators are left associative, so the right operand binds more tightly
+                node = Node(label, [node, (yield self.B(operator_level + 1))])
+        return node
+
+
+    def R(self, first: Optional[Node] = None) -> Node:
+        """
+        Parse the expression starting with R.
+        Handles the grammar rule R -> Rn { Rn }.
+        B passes the first Rn when it has already parsed it.
+        """
+        token_storage = self.token_storage
+        node = first
+        if node is None:
+            node = (yield self.Rn()) if token_storage.top().kind == KIND_OPEN else self.Rl()
+
+        # true, false, nil and dummy are identifiers that are not keywords, so they start an Rn as well
+        while token_storage.top().kind in RN_START:
+            node = Node("gamma", [node, (yield self.Rn()) if token_storage.top().kind == KIND_OPEN else self.Rl()])
+        return node
+
+
+    def Rn(self) -> Node:
+        """
+        Parse the expression starting with Rn.
+        Handles the grammar rule Rn -> identifier | integer | string | true | false | nil | ( E ) | dummy.
+        Only ( E ) can nest, so the other alternatives are parsed by Rl without a generator.
+        """
+        token_storage = self.token_storage
+
+        if token_storage.top().kind == KIND_OPEN:
+            token_storage.pop()
+            node = (yield self.E())
+            if token_storage.top().kind == KIND_CLOSE:
+                token_storage.pop()
+            else:
+                raise SyntaxError("')' expected")
+            return node
+        return self.Rl()
+
+
+    def Rl(self) -> Node:
+        """
+        Parse the Rn that are single tokens.
+        Handles the grammar rule Rn -> identifier | integer | string | true | false | nil | dummy.
+        """
+        token_storage = self.token_storage
+        top = token_storage.top()
+
+        if top.kind == KIND_IDENTIFIER:
+            # Parse Identifier
+            return identifier_node(token_storage.pop().value)
+        elif top.kind == KIND_INTEGER:
+            # Parse Integer
+            return Node(f"<INT:{token_storage.pop().value}>")
+        elif top.kind == KIND_STRING:
+            # Parse String
+            return Node(f"<STR:{token_storage.pop().value}>")
+        elif top.value in LITERAL_NAMES:
+            # Parse true, false, nil or dummy
+            token_storage.pop()
+            return Node(LITERAL_NAMES[top.value])
+        else:
+            raise SyntaxError(f"Identifier, Integer, String, 'true', 'false', 'nil', '(', 'dummy' expected, got: {top.value}")
+
+
+    def D(self) -> Node:
+        """
+        Parse the expression starting with D.
+        Handles the grammar rule D -> Da [ within D ].
+        """
+        token_storage = self.token_storage
+        node = (yield self.Da())
+
+        while token_storage.top().kind == KIND_WITHIN:
+            token_storage.pop()
+            node = Node("within", [node, (yield self.D())])
+        return node
+
+
+    def Da(self) -> Node:
+        """
+        Parse the expression starting with Da.
+        Handles the grammar rule Da -> Dr { and Dr }.
+        """
+        token_storage = self.token_storage
+        node = (yield self.Dr())
+
+        if token_storage.top().kind == KIND_AND:
+            children = [node]
+            while token_storage.top().kind == KIND_AND:
+                token_storage.pop()
+                children.append((yield self.Dr()))
+            node = Node("and", children)
+        return node
+
+
+    def Dr(self) -> Node:
+        """
+        Parse the expression starting with Dr.
+        Handles the grammar rule Dr -> rec Db | Db.
+        """
+        token_storage = self.token_storage
+
+        if token_storage.top().kind == KIND_REC:
+            token_storage.pop()
+            return Node("rec", [(yield self.Db())])
+        else:
+            return (yield self.Db())
+
+
+    def Db(self) -> Node:
+        """
+        Parse the expression starting with Db.
+        Handles the grammar rule Db -> ( D ) | identifier Vl = E | Vb { , Vb } = E | epsilon.
+        """
+        token_storage = self.token_storage
+
+        if token_storage.top().kind == KIND_OPEN:
+            token_storage.pop()
+            node = (yield self.D())
+
+            if token_storage.top().kind == KIND_CLOSE:
+                token_storage.pop()
+            else:
+                raise SyntaxError("')' expected")
+            return node
+        elif token_storage.top().kind == KIND_IDENTIFIER:
+            # Parse Identifier
+            name = identifier_node(token_storage.pop().value)
+
+            if token_storage.top().kind == KIND_COMMA:
+                token_storage.pop()
+                names = self.Vl(name)
+
+                if token_storage.top().kind == KIND_EQUALS:
+                    token_storage.pop()
+                    return Node("=", [names, (yield self.E())])
+                else:
+                    raise SyntaxError("'=' expected")
+            else:
+                children = [name]
+
+                while token_storage.top().kind == KIND_IDENTIFIER:
+                    children.append(self.Vb())
+
+                if token_storage.top().kind == KIND_OPEN:
+                    children.append(self.Vb())
+
+                if len(children) == 1 and token_storage.top().kind == KIND_EQUALS:
+                    token_storage.pop()
+                    return Node("=", [name, (yield self.E())])
+                elif len(children) != 1 and token_storage.top().kind == KIND_EQUALS:
+                    token_storage.pop()
+                    children.append((yield self.E()))
+                    return Node("fcn_form", children)
+                else:
+                    raise SyntaxError("'=' expected")
+        else:
+            raise SyntaxError("'(' or Identifier expected")
+
+
+    def Vb(self) -> Node:
+        """
+        Parse the expression starting with Vb.
+        Handles the grammar rule Vb -> identifier | ( ) | ( identifier Vl ).
+        """
+        token_storage = self.token_storage
+
+        if token_storage.top().kind == KIND_IDENTIFIER:
+            # Parse Identifier
+            return identifier_node(token_storage.pop().value)
+        elif token_storage.top().kind == KIND_OPEN:
+            token_storage.pop()
+
+            if token_storage.top().kind == KIND_CLOSE:
+                token_storage.pop()
+                return Node("()")
+            elif token_storage.top().kind == KIND_IDENTIFIER:
+                # Parse Identifier
+                node = identifier_node(token_storage.pop().value)
+
+                if token_storage.top().kind == KIND_COMMA:
+                    token_storage.pop()
+                    node = self.Vl(node)
+
+                if token_storage.top().kind == KIND_CLOSE:
+                    token_storage.pop()
+                else:
+                    raise SyntaxError("')' expected")
+                return node
+            else:
+                raise SyntaxError("Identifier or ')' expected")
+        else:
+            raise SyntaxError("Identifier or '(' expected")
+
+
+    def Vl(self, first: Node) -> Node:
+        """
+        Parse the expression starting with Vl, after the first identifier of the list and its comma.
+        Handles the grammar rule Vl -> identifier { , identifier }.
+        """
+        token_storage = self.token_storage
+
+        if token_storage.top().kind == KIND_IDENTIFIER:
+            # Parse Identifier
+            children = [first, identifier_node(token_storage.pop().value)]
+
+            while token_storage.top().kind == KIND_COMMA:
+                token_storage.pop()
+                children.append(identifier_node(token_storage.pop().value))
+
+            return Node(",", children)
+        else:
+            raise SyntaxError("Identifier expected")
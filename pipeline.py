@@ -0,0 +1,92 @@
+"""
+Front end of the RPAL interpreter as a single pipeline.
+
+A Pipeline reads the source of a program once and computes each stage (tokens,
+abstract syntax tree, standardized tree and control structures) the first time
+it is needed. Every stage is cached, so printing the intermediate trees and
+then executing the program runs the front end only once.
+
+The control structures are also kept in the on-disk cache (see cache.py), so
+a program that has been run before is not lexed, parsed or standardized again.
+"""
+
+from functools import cached_property
+from lexer import Lexer, stream_tokens
+from parser import Parser
+from standadizer import standardize
+import cache
+from csemachine import generate_control_structures
+from errors import RPALError
+
+
+class Pipeline:
+    """
+    The source of a program and the results of the front-end stages computed from it.
+    The source is either read from a file or given directly; only programs read from a
+    file are kept in the on-disk cache.
+    """
+    def __init__(self, filename=None, use_cache=True, source=None):
+        self.filename = filename
+        self.use_cache = use_cache and filename is not None
+        if source is not None:
+            self.source = source
+
+    @cached_property
+    def source(self):
+        try:
+            with open(self.filename, 'r') as file:
+                return file.read()
+        except Exception as e:
+            self.read_error(e)
+
+    # A file that cannot be read is reported as an error in the program, so that the caller decides what to do.
+    def read_error(self, error):
+        if isinstance(error, FileNotFoundError):
+            raise RPALError(f"Error: File '{self.filename}' not found.") from error
+        raise RPALError(f"Error reading file '{self.filename}': {error}") from error
+
+    @cached_property
+    def tokens(self):
+        return Lexer(self.source).tokenize()
+
+    @cached_property
+    def ast(self):
+        return Parser(self.token_stream()).parse()
+
+    # The parser takes the tokens from an iterator as it goes, so the lexer and the parser run together and
+    # the list of tokens is never built. When the source is not needed for anything else, that is when it
+    # has not been read and the cache is not used, the file is lexed in chunks without reading it whole.
+    def token_stream(self):
+        if "tokens" in self.__dict__:
+            return iter(self.tokens)
+        if "source" in self.__dict__ or self.use_cache:
+            return Lexer(self.source).tokens()
+        return self.read_tokens()
+
+    def read_tokens(self):
+        try:
+            file = open(self.filename, 'r')
+        except Exception as e:
+            self.read_error(e)
+        with file:
+            yield from stream_tokens(file)
+
+    # Standardizing rewrites the nodes of the AST, so the AST is dropped once it has been standardized and
+    # is parsed again if it is asked for afterwards.
+    @cached_property
+    def st(self):
+        st = standardize(self.ast)
+        del self.ast
+        return st
+
+    @cached_property
+    def control_structures(self):
+        if self.use_cache:
+            control_structures = cache.load(self.filename, self.source)
+            if control_structures is not None:
+                return control_structures
+
+        control_structures = generate_control_structures(self.st)
+        if self.use_cache:
+            cache.store(self.filename, self.source, control_structures)
+        return control_structures
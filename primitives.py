@@ -0,0 +1,74 @@
+# This file contains the operations on RPAL values shared by the execution engines.
+import operator
+from errors import RPALError
+from structures import Opcode
+from values import Vector, String, is_string, stem, stern, concatenate
+
+builtInFunctions = ["Order", "Print", "print", "Conc", "Stern", "Stem", "Isinteger", "Istruthvalue", "Isstring", "Istuple", "Isfunction", "ItoS"]
+
+
+# The aug operator appends an element to a tuple. Appending a tuple appends all of its elements.
+# Only tuples can be augmented: any other value fails as adding a tuple to it does.
+def aug(rand_1, rand_2):
+    if (type(rand_1) != Vector):
+        return rand_1 + (rand_2 if type(rand_2) == Vector else Vector([rand_2]))
+    if (type(rand_2) == Vector):
+        return rand_1.extend(rand_2)
+    return rand_1.append(rand_2)
+
+BINARY_FUNCTIONS = {
+    Opcode.ADD: operator.add,
+    Opcode.SUBTRACT: operator.sub,
+    Opcode.MULTIPLY: operator.mul,
+    Opcode.DIVIDE: operator.floordiv,
+    Opcode.POWER: operator.pow,
+    Opcode.GR: operator.gt,
+    Opcode.GE: operator.ge,
+    Opcode.LS: operator.lt,
+    Opcode.LE: operator.le,
+    Opcode.EQ: operator.eq,
+    Opcode.NE: operator.ne,
+    Opcode.OR: lambda rand_1, rand_2: rand_1 or rand_2,
+    Opcode.AND: lambda rand_1, rand_2: rand_1 and rand_2,
+    Opcode.AUG: aug,
+}
+
+UNARY_FUNCTIONS = {
+    Opcode.NEG: operator.neg,
+    Opcode.NOT: operator.not_,
+}
+
+
+# The Print function prints the output to the command prompt, or to the given stream.
+# It returns the value as it was printed, which is the value of the call, as in the CSE machine.
+def print_value(argument, output=None):
+    # If there are escape characters in the string, we need to format it properly.
+    if type(argument) == String:
+        argument = str(argument)
+    if type(argument) == str:
+        if "\\n" in argument:
+            argument = argument.replace("\\n", "\n")
+        if "\\t" in argument:
+            argument = argument.replace("\\t", "\t")
+    print(argument, end='', file=output)
+    return argument
+
+# The ItoS function converts integers to strings.
+def integer_to_string(argument):
+    if (type(argument) == int):
+        return str(argument)
+    raise RPALError("Error: ItoS function can only accept integers.")
+
+# The following functions take a single argument and return the result.
+# Print and Conc are left to the engines since they need access to the machine state.
+BUILT_IN_FUNCTIONS = {
+    "Order": len,
+    "Stern": stern,
+    "Stem": stem,
+    "Isinteger": lambda argument: type(argument) == int,
+    "Istruthvalue": lambda argument: type(argument) == bool,
+    "Isstring": is_string,
+    "Istuple": lambda argument: type(argument) == Vector,
+    "Isfunction": lambda argument: argument in builtInFunctions,
+    "ItoS": integer_to_string,
+}
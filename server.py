@@ -0,0 +1,188 @@
+"""
+Interpreter server for RPAL programs.
+
+The server keeps a pool of warm worker processes, each with the interpreter
+already imported, and listens on a Unix domain socket. A client sends the
+source of a program and gets back its output and exit status, so a request
+does not pay for starting Python and importing the interpreter.
+
+Every message is a JSON object preceded by its length as a 4-byte big-endian
+integer. A request has the fields "source" and, optionally, "engine" and
+"timeout"; a response has the fields "output", "status" and "time". A worker
+that runs past the timeout is killed and replaced by a new one. A request may
+ask for a shorter timeout than the server's, but not for a longer one. A
+request that is not valid is answered with exit status 1 and an "error" field
+that says why. The client side of the protocol is in client.py.
+"""
+
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from contextlib import redirect_stdout
+from client import DEFAULT_SOCKET, HEADER, encode_message
+
+DEFAULT_TIMEOUT = 10.0
+
+
+# The following function runs in a worker process. It runs the programs it receives one at a time.
+def worker_main(connection):
+    from errors import RPALError
+    from interpreter import Interpreter
+
+    # Interrupting the server must not print a traceback for every worker.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            source, engine = connection.recv()
+        except EOFError:
+            return
+
+        output = io.StringIO()
+        status = 0
+        with redirect_stdout(output):
+            try:
+                Interpreter(engine, output).run(source)
+            except RPALError:
+                # The interpreter has already written the error to the output.
+                status = 1
+            except Exception as e:
+                print(f"Error executing program: {e}")
+                status = 1
+        connection.send((output.getvalue(), status))
+
+
+# The following function returns why a request is not valid, or None when it is valid.
+def request_error(request):
+    if not isinstance(request, dict):
+        return "the request must be a JSON object"
+    if not isinstance(request.get("source", ""), str):
+        return "the source must be a string"
+    if not isinstance(request.get("engine", "cse"), str):
+        return "the engine must be a string"
+    timeout = request.get("timeout")
+    if timeout is not None and (type(timeout) not in (int, float) or not timeout > 0):
+        return "the timeout must be a positive number of seconds"
+    return None
+
+
+# The following function returns the response to a request that is not valid.
+def error_response(error):
+    return {"output": f"Error: {error}.\n", "status": 1, "time": 0.0, "error": error}
+
+
+class Worker:
+    """A worker process and the connection used to send it programs."""
+    def __init__(self):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    # The following function sends a program to the worker and waits for its output without blocking the loop.
+    async def run(self, source, engine):
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        descriptor = self.connection.fileno()
+
+        def readable():
+            if not done.done():
+                done.set_result(None)
+
+        self.connection.send((source, engine))
+        loop.add_reader(descriptor, readable)
+        try:
+            await done
+        finally:
+            loop.remove_reader(descriptor)
+        return self.connection.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class Server:
+    """Accepts programs on a Unix domain socket and runs them on a pool of workers."""
+    def __init__(self, path=DEFAULT_SOCKET, workers=None, timeout=DEFAULT_TIMEOUT):
+        self.path = path
+        self.size = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.idle = None                # Queue of the workers that are not running a program
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    return
+                (length,) = HEADER.unpack(header)
+                data = await reader.readexactly(length)
+                try:
+                    request = json.loads(data)
+                except ValueError:
+                    response = error_response("the request is not valid JSON")
+                else:
+                    error = request_error(request)
+                    response = error_response(error) if error else await self.run(request)
+                writer.write(encode_message(response))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # The following function runs a valid request on an idle worker. A worker that times out is replaced.
+    # The timeout of the server is the longest a request may ask for, so no client can hold a worker longer.
+    async def run(self, request):
+        source = request.get("source", "")
+        engine = request.get("engine", "cse")
+        timeout = min(request.get("timeout", self.timeout), self.timeout)
+
+        worker = await self.idle.get()
+        start = time.perf_counter()
+        try:
+            output, status = await asyncio.wait_for(worker.run(source, engine), timeout)
+        except asyncio.TimeoutError:
+            worker.kill()
+            worker = Worker()
+            output, status = f"Error: the program did not finish in {timeout} seconds.\n", 1
+        except (EOFError, OSError):
+            # The worker died, for example because it ran out of memory.
+            worker.kill()
+            worker = Worker()
+            output, status = "Error: the worker running the program stopped.\n", 1
+        finally:
+            self.idle.put_nowait(worker)
+        return {"output": output, "status": status, "time": time.perf_counter() - start}
+
+    async def serve(self):
+        self.idle = asyncio.Queue()
+        workers = [Worker() for _ in range(self.size)]
+        for worker in workers:
+            self.idle.put_nowait(worker)
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stopped.set)
+
+        print(f"Serving on {self.path} with {self.size} workers", file=sys.stderr)
+        try:
+            async with server:
+                await stopped.wait()
+        finally:
+            while not self.idle.empty():
+                self.idle.get_nowait().kill()
+            if os.path.exists(self.path):
+                os.remove(self.path)
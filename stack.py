@@ -1,3 +1,5 @@
+from errors import RPALError
+
 class Stack:
     def __init__(self, type):
         self.stack = []
@@ -26,9 +28,8 @@ class Stack:
         if not self.is_empty():
             return self.stack.pop()
         else:
-            print("Stack became empty!")
-            exit(1)
+            raise RPALError("Stack became empty!")
 
     # The following function lets you check whether the stack is empty.
     def is_empty(self):
-        return len(self.stack) == 0
\ No newline at end of file
+        return len(self.stack) == 0
@@ -1,69 +1,34 @@
-# Compatible Node class for the standardizer
-from parser import TokenStorage, Parser, Tree  # Import the parser components
-
-class Node:
-    def __init__(self, value, children=None):
-        self.value = value
-        self.children = children if children else []
-
-# Adapter function to convert parser's TreeNode to standardizer's Node
-def convert_tree_to_node(tree_node):
-    """Convert TreeNode/LeafNode from parser to Node in standardizer for ease of use"""
-    if tree_node is None:
-        return None
-    
-    # Get the label as the value
-    if hasattr(tree_node, 'label'):
-        value = tree_node.label
-        #print("Converting TreeNode with label:", value)
-    else:
-        value = str(tree_node)
-    
-
-    if hasattr(tree_node, 'value') and tree_node.value is not None:
-    # Special literals
-        if tree_node.value in ["true", "false", "nil", "dummy"]:
-            value = f"<{tree_node.value}>"
-        elif value == "ID":
-            value = f"<ID:{tree_node.value}>"
-        elif value == "INT":
-            value = f"<INT:{tree_node.value}>"
-        elif value == "STR":
-            value = f"<STR:{tree_node.value}>"
-    
-    # Convert children recursively
-    converted_children = []
-    if hasattr(tree_node, 'children'):
-        for child in tree_node.children:
-            converted_child = convert_tree_to_node(child)
-            if converted_child:
-                converted_children.append(converted_child)
-    
-    return Node(value, converted_children)
+from node import Node  # The parser builds the AST from the same nodes
+from parser import Parser  # Import the parser components
 
-# Updated standardizer function to work with the second parser
+# The standardizer rewrites the AST in place, so afterwards the tree is the standardized tree.
 def standardize(tree_root):
     """
-    Standardize AST from the second parser implementation
+    Standardize the AST built by the parser and return the root of the standardized tree
     """
-    # Convert the parser's tree structure to the standardizer's expected format
-    node_root = convert_tree_to_node(tree_root)
-    #print("Converted Node Root:", node_root.value)
-    
-    # Apply the original standardization logic
-    standardized_node = make_standardized_tree(node_root)
-    
-    return standardized_node
+    return make_standardized_tree(tree_root)
 
 # The original make_standardized_tree function (from paste.txt)
 def make_standardized_tree(root):
     if root is None:
         return None
-        
-    # Recursively standardize children first
-    for child in root.children:
-        make_standardized_tree(child)
 
+    # Standardize children before their parents. The tree is traversed in post-order
+    # with an explicit stack, so deeply nested programs do not hit the recursion limit.
+    pending = [(root, False)]
+    while pending:
+        node, children_done = pending.pop()
+        if children_done:
+            standardize_node(node)
+        else:
+            pending.append((node, True))
+            for child in reversed(node.children):
+                pending.append((child, False))
+
+    return root
+
+# This function standardizes a single node whose children are already standardized.
+def standardize_node(root):
     if root.value == "let" and len(root.children) > 0 and root.children[0].value == "=":
         child_0 = root.children[0]
         child_1 = root.children[1]
@@ -178,25 +143,21 @@ def make_standardized_tree(root):
 # Function to print the tree for debugging
 def print_tree(node, dots=0):
     """Print the tree structure for debugging"""
-    if node is None:
-        return
-    
-    print("." * dots + str(node.value))
-    for child in node.children:
-        print_tree(child, dots + 1)
+    pending = [(node, dots)]
+    while pending:
+        node, dots = pending.pop()
+        if node is None:
+            continue
+        
+        print("." * dots + str(node.value))
+        for child in reversed(node.children):
+            pending.append((child, dots + 1))
 
 # Example usage function
 def parse_and_standardize(source_tokens):
     
-    # Set up the token storage
-    token_storage = TokenStorage.get_instance()
-    token_storage.set_tokens(source_tokens)
-    
-    # Parse the tokens
-    Parser.parse()
-    
-    # Get the AST root
-    ast_root = Tree.get_instance().ast_root
+    # Parse the tokens and get the AST root
+    ast_root = Parser(source_tokens).parse()
     
     # Standardize the AST
     standardized_ast = standardize(ast_root)
@@ -1,4 +1,7 @@
 # This file contains the structures used in the project.
+import sys
+from enum import Enum
+
 class Delta:
     def __init__(self, number):
         self.number = number
@@ -7,14 +10,78 @@ class Tau:
     def __init__(self, number):
         self.number = number
         
+# The parameters of a lambda are its binding plan, computed once when the control structures are generated:
+# the argument of a call fills the slots of the parameters in order, and a lambda with an arity above one
+# takes a tuple of exactly that many values. The closures and etas made at run time copy the plan of the
+# lambda they are made from.
 class Lambda:
     def __init__(self, number):
         self.number = number
         self.bounded_variable = None
+        self.parameters = ()            # Names of the parameters, by slot
+        self.arity = 1
         self.environment = None
+        self.captures = ()              # Addresses of the free variables a closure of the lambda captures
         
 class Eta:
     def __init__(self, number):
         self.number = number
         self.bounded_variable = None
-        self.environment = None        
\ No newline at end of file
+        self.parameters = ()
+        self.arity = 1
+        self.environment = None
+
+# The following structures are the instructions stored in the control structures.
+# Literals and identifiers are resolved when the control structures are generated,
+# so the CSE machine does not have to parse strings such as "<INT:5>" at run time.
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+class Identifier:
+    def __init__(self, name):
+        self.name = sys.intern(name)
+
+# Identifiers resolved to slots. A Variable is a parameter of the lambda the code belongs to and a
+# FreeVariable is one of the values captured by its closure. The name is kept for engines that look
+# variables up by name.
+class Variable:
+    def __init__(self, name, slot):
+        self.name = sys.intern(name)
+        self.slot = slot
+
+class FreeVariable:
+    def __init__(self, name, slot):
+        self.name = sys.intern(name)
+        self.slot = slot
+
+class Opcode(Enum):
+    GAMMA = "gamma"
+    BETA = "beta"
+
+    # Binary operators
+    ADD = "+"
+    SUBTRACT = "-"
+    MULTIPLY = "*"
+    DIVIDE = "/"
+    POWER = "**"
+    GR = "gr"
+    GE = "ge"
+    LS = "ls"
+    LE = "le"
+    EQ = "eq"
+    NE = "ne"
+    OR = "or"
+    AND = "&"
+    AUG = "aug"
+
+    # Unary operators
+    NEG = "neg"
+    NOT = "not"
+
+BINARY_OPERATORS = frozenset([
+    Opcode.ADD, Opcode.SUBTRACT, Opcode.MULTIPLY, Opcode.DIVIDE, Opcode.POWER,
+    Opcode.GR, Opcode.GE, Opcode.LS, Opcode.LE, Opcode.EQ, Opcode.NE,
+    Opcode.OR, Opcode.AND, Opcode.AUG,
+])
+UNARY_OPERATORS = frozenset([Opcode.NEG, Opcode.NOT])
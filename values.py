@@ -0,0 +1,296 @@
+# This file contains the representations of RPAL values that are not plain Python values.
+
+
+class Vector:
+    """
+    An immutable RPAL tuple.
+
+    The items live in a list that may be shared with other vectors, and a vector
+    only sees the first `length` items of it. Appending to a vector that ends at
+    the end of the shared list appends to the list in place, so building a tuple
+    with repeated `aug` costs amortized O(1) per element. Appending to any other
+    vector copies its items first, which keeps every vector unchanged.
+    """
+    __slots__ = ("items", "length")
+
+    def __init__(self, items=None, length=None):
+        self.items = items if items is not None else []
+        self.length = len(self.items) if length is None else length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        # Slices and indexes that are not integers behave as they do on Python tuples.
+        if type(index) != int:
+            return as_vector(tuple(self)[index])
+        # Negative indexes count from the end, as they do for Python tuples.
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("tuple index out of range")
+        return self.items[index]
+
+    def __iter__(self):
+        items = self.items
+        for i in range(self.length):
+            yield items[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (Vector, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    # Vectors are printed the same way as Python tuples.
+    def __repr__(self):
+        return repr(tuple(self))
+
+    # The operators behave as they do on Python tuples: tuples can be concatenated, repeated and compared,
+    # and any other operation raises the same error as it does with a Python tuple.
+    def __lt__(self, other):
+        return tuple(self) < as_tuple(other)
+
+    def __le__(self, other):
+        return tuple(self) <= as_tuple(other)
+
+    def __gt__(self, other):
+        return tuple(self) > as_tuple(other)
+
+    def __ge__(self, other):
+        return tuple(self) >= as_tuple(other)
+
+    def __add__(self, other):
+        return as_vector(tuple(self) + as_tuple(other))
+
+    def __radd__(self, other):
+        return as_vector(other + tuple(self))
+
+    def __mul__(self, other):
+        return as_vector(tuple(self) * other)
+
+    def __rmul__(self, other):
+        return as_vector(other * tuple(self))
+
+    def __sub__(self, other):
+        return tuple(self) - other
+
+    def __rsub__(self, other):
+        return other - tuple(self)
+
+    def __floordiv__(self, other):
+        return tuple(self) // other
+
+    def __rfloordiv__(self, other):
+        return other // tuple(self)
+
+    def __pow__(self, other):
+        return tuple(self) ** other
+
+    def __rpow__(self, other):
+        return other ** tuple(self)
+
+    def __neg__(self):
+        return -tuple(self)
+
+    def append(self, item):
+        """Return a new vector with the item added at the end."""
+        if self.length and len(self.items) == self.length:
+            self.items.append(item)
+            return Vector(self.items, self.length + 1)
+        items = self.items[:self.length]
+        items.append(item)
+        return Vector(items)
+
+    def extend(self, other):
+        """Return a new vector with the items of another vector added at the end."""
+        if self.length and len(self.items) == self.length:
+            self.items.extend(other)
+            return Vector(self.items, len(self.items))
+        items = self.items[:self.length]
+        items.extend(other)
+        return Vector(items)
+
+
+# The following functions convert between vectors and Python tuples. Other values are returned as they are.
+def as_tuple(value):
+    return tuple(value) if type(value) == Vector else value
+
+def as_vector(value):
+    return Vector(list(value)) if type(value) == tuple else value
+
+
+class String:
+    """
+    An RPAL string that avoids copying characters.
+
+    A string is either a slice [start, end) of a flat Python string, or the
+    concatenation of two strings (a rope node) that is flattened the first time
+    its characters are needed. Stern only moves the start of a slice, and Conc
+    only creates a rope node, so both take constant time.
+    """
+    __slots__ = ("base", "start", "end", "left", "right", "length")
+
+    # Concatenations up to this length are cheaper to copy than to keep as a rope node.
+    SHORT = 64
+
+    def __init__(self, base=None, start=0, end=None, left=None, right=None):
+        self.base = base
+        self.left = left
+        self.right = right
+        if base is not None:
+            self.start = start
+            self.end = len(base) if end is None else end
+            self.length = self.end - self.start
+        else:
+            self.start = self.end = 0
+            self.length = len(left) + len(right)
+
+    def flatten(self):
+        """Turn a rope node into a slice, visiting the pieces without recursion."""
+        if self.base is None:
+            pieces = []
+            nodes = [self]
+            while nodes:
+                node = nodes.pop()
+                if type(node) == str:
+                    pieces.append(node)
+                elif node.base is not None:
+                    pieces.append(node.base[node.start:node.end])
+                else:
+                    nodes.append(node.right)
+                    nodes.append(node.left)
+            self.base = "".join(pieces)
+            self.start = 0
+            self.end = self.length
+            self.left = self.right = None
+        return self
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        self.flatten()
+        if self.start == 0 and self.end == len(self.base):
+            return self.base
+        return self.base[self.start:self.end]
+
+    # Strings inside tuples are printed with quotes, like Python strings.
+    def __repr__(self):
+        return repr(str(self))
+
+    def __eq__(self, other):
+        if isinstance(other, (String, str)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    # The operators behave as they do on Python strings, whatever the length of the string and however
+    # it was built. Operands that are not strings raise the same errors as they do with Python strings.
+    def __lt__(self, other):
+        return str(self) < as_str(other)
+
+    def __le__(self, other):
+        return str(self) <= as_str(other)
+
+    def __gt__(self, other):
+        return str(self) > as_str(other)
+
+    def __ge__(self, other):
+        return str(self) >= as_str(other)
+
+    def __add__(self, other):
+        return str(self) + as_str(other)
+
+    def __radd__(self, other):
+        return other + str(self)
+
+    def __mul__(self, other):
+        return str(self) * other
+
+    def __rmul__(self, other):
+        return other * str(self)
+
+    def __sub__(self, other):
+        return str(self) - other
+
+    def __rsub__(self, other):
+        return other - str(self)
+
+    def __floordiv__(self, other):
+        return str(self) // other
+
+    def __rfloordiv__(self, other):
+        return other // str(self)
+
+    def __pow__(self, other):
+        return str(self) ** other
+
+    def __rpow__(self, other):
+        return other ** str(self)
+
+    def __neg__(self):
+        return -str(self)
+
+    def __getitem__(self, index):
+        self.flatten()
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("string index out of range")
+        return self.base[self.start + index]
+
+
+# The following function returns a String as a Python string, and any other value as it is.
+def as_str(value):
+    return str(value) if type(value) == String else value
+
+# The following function checks whether a value is an RPAL string.
+def is_string(value):
+    return type(value) == str or type(value) == String
+
+# The following function returns the text of the result of a program, which is the same whatever engine ran it.
+# Booleans are written in lowercase and strings inside tuples without quotes, as rpal.exe prints them, and a
+# function is written as the lambda closure it evaluates to.
+def format_result(value):
+    if type(value) == bool:
+        return str(value).lower()
+    if value is None:
+        return "dummy"
+    if type(value) == Vector:
+        if value.length == 0:
+            return "nil"
+        return "(" + ", ".join(format_result(element) for element in value) + ")"
+    if hasattr(value, "bounded_variable"):
+        return "[lambda closure: " + str(value.bounded_variable) + ": " + str(value.number) + "]"
+    return str(value)
+
+# The Stem function returns the first letter of the given string.
+def stem(argument):
+    return argument[0]
+
+# The Stern function returns the string without the first letter, without copying it.
+def stern(argument):
+    if type(argument) == str:
+        return String(argument, 1) if argument else argument[1:]
+    if type(argument) == String:
+        argument.flatten()
+        start = min(argument.start + 1, argument.end)
+        return String(argument.base, start, argument.end)
+    return argument[1:]
+
+# The Conc function concatenates two strings. Long results are kept as rope nodes.
+def concatenate(rand_1, rand_2):
+    if not (is_string(rand_1) and is_string(rand_2)):
+        return rand_1 + rand_2
+    if len(rand_1) + len(rand_2) <= String.SHORT:
+        return str(rand_1) + str(rand_2)
+    if not rand_2:
+        return rand_1
+    if not rand_1:
+        return rand_2
+    return String(left=rand_1, right=rand_2)
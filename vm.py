@@ -0,0 +1,438 @@
+"""
+Bytecode virtual machine for RPAL programs.
+
+The control structures generated for the CSE machine are compiled into a flat
+bytecode array. Every instruction takes two slots, an integer opcode and its
+operand, and is executed by the handler registered for the opcode in a dispatch
+table. Function calls and conditionals become jumps inside the array, so the
+machine never copies control structures at run time.
+
+Variables are read from the same flat frames as in the CSE machine: a
+parameter by its slot in the frame of the call and a free variable by its slot
+in the values captured by the closure. Recursive functions are bound to
+self-referential closures once, as in Rule 12 of the CSE machine.
+"""
+
+from environment import Frame
+from errors import RPALError
+from primitives import BINARY_FUNCTIONS, UNARY_FUNCTIONS, BUILT_IN_FUNCTIONS, builtInFunctions, print_value, concatenate
+from structures import *
+from values import Vector, format_result
+
+# Opcodes of the virtual machine
+HALT = 0
+LOAD_CONST = 1
+LOAD_NAME = 2                   # An identifier that no lambda binds; it is reported when it is evaluated
+MAKE_CLOSURE = 3
+MAKE_TUPLE = 4
+APPLY = 5
+RETURN = 6
+JUMP = 7
+JUMP_IF_FALSE = 8
+BINARY = 9
+UNARY = 10
+LOAD_LOCAL = 11                 # A parameter of the current call, by slot
+LOAD_FREE = 12                  # A value captured by the current closure, by slot
+
+# Superinstructions for the most common sequences. Their operand indexes the operand table, where
+# a variable is given as a (free, slot) pair: free is true for a captured value.
+APPLY_VARIABLE = 13             # LOAD f; APPLY
+BINARY_VARIABLE_CONST = 14      # LOAD_CONST c; LOAD x; BINARY op  (computes x op c)
+BINARY_VARIABLE_VARIABLE = 15   # LOAD y; LOAD x; BINARY op        (computes x op y)
+
+OPCODE_NAMES = ["HALT", "LOAD_CONST", "LOAD_NAME", "MAKE_CLOSURE", "MAKE_TUPLE", "APPLY",
+                "RETURN", "JUMP", "JUMP_IF_FALSE", "BINARY", "UNARY", "LOAD_LOCAL", "LOAD_FREE",
+                "APPLY_VARIABLE", "BINARY_VARIABLE_CONST", "BINARY_VARIABLE_VARIABLE"]
+
+
+class Partial:
+    """A built-in function that has received the first of its two arguments."""
+    def __init__(self, function, argument):
+        self.function = function
+        self.argument = argument
+
+
+class Program:
+    """Bytecode compiled from the control structures, with its constant and name pools."""
+    def __init__(self):
+        self.code = []
+        self.constants = []
+        self.names = []
+        self.operands = []              # Operands of the superinstructions
+        self.entries = {}               # Address of the body of each lambda, by lambda number
+        self.barrier = 0                # No instruction before this address may be fused
+
+    def emit(self, opcode, operand=0):
+        """Append an instruction and return its address."""
+        self.code.append(opcode)
+        self.code.append(operand)
+        return len(self.code) - 2
+
+    def patch(self, address, operand):
+        """Set the operand of the instruction at the given address."""
+        self.code[address + 1] = operand
+        self.barrier = operand
+
+    def shorten_returns(self):
+        """Replace every jump that leads to a return by the return itself.
+
+        A call in the then part of a conditional is then followed by a return,
+        so it is run as a tail call like a call in the else part."""
+        code = self.code
+        for address in range(0, len(code), 2):
+            if code[address] == JUMP:
+                target = code[address + 1]
+                while code[target] == JUMP:
+                    target = code[target + 1]
+                if code[target] == RETURN:
+                    code[address] = RETURN
+                    code[address + 1] = 0
+
+    def fusable(self, count):
+        """Return the last count instructions if they can be fused with the next one."""
+        start = len(self.code) - 2 * count
+        if start < self.barrier:
+            return None
+        return [(self.code[i], self.code[i + 1]) for i in range(start, len(self.code), 2)]
+
+    def fuse(self, count, opcode, operand):
+        """Replace the last count instructions by a superinstruction."""
+        del self.code[len(self.code) - 2 * count:]
+        self.operands.append(operand)
+        return self.emit(opcode, len(self.operands) - 1)
+
+    def disassemble(self):
+        """Return a readable listing of the bytecode for debugging."""
+        lines = []
+        for address in range(0, len(self.code), 2):
+            opcode, operand = self.code[address], self.code[address + 1]
+            lines.append(f"{address:>6} {OPCODE_NAMES[opcode]:<24} {operand}")
+        return "\n".join(lines)
+
+
+class Compiler:
+    """Compiles the control structures of a program into a single bytecode array."""
+    def __init__(self, control_structures):
+        self.control_structures = control_structures
+        self.program = Program()
+        self.constant_index = {}
+        self.name_index = {}
+        self.pending = []
+
+    def compile(self):
+        program = self.program
+        self.compile_block(0)
+        program.emit(HALT)
+
+        # The body of every lambda is compiled once and ends with a return.
+        while self.pending:
+            number = self.pending.pop()
+            if number in program.entries:
+                continue
+            program.entries[number] = len(program.code)
+            self.compile_block(number)
+            program.emit(RETURN)
+        program.shorten_returns()
+        return program
+
+    def constant(self, value):
+        # Equal values of different types (1 and True) must not share a slot.
+        key = (type(value), value)
+        if key not in self.constant_index:
+            self.constant_index[key] = len(self.program.constants)
+            self.program.constants.append(value)
+        return self.constant_index[key]
+
+    def name(self, name):
+        if name not in self.name_index:
+            self.name_index[name] = len(self.program.names)
+            self.program.names.append(name)
+        return self.name_index[name]
+
+    # The following function returns the (free, slot) pair of an instruction that loads a variable, or None.
+    def variable(self, instruction):
+        opcode, operand = instruction
+        if opcode == LOAD_LOCAL:
+            return (False, operand)
+        if opcode == LOAD_FREE:
+            return (True, operand)
+        return None
+
+    def emit_apply(self):
+        program = self.program
+        previous = program.fusable(1)
+        if previous and self.variable(previous[0]):
+            program.fuse(1, APPLY_VARIABLE, self.variable(previous[0]))
+        else:
+            program.emit(APPLY)
+
+    def emit_binary(self, function):
+        program = self.program
+        previous = program.fusable(2)
+        if previous and self.variable(previous[1]):
+            free, slot = self.variable(previous[1])
+            if previous[0][0] == LOAD_CONST:
+                value = program.constants[previous[0][1]]
+                program.fuse(2, BINARY_VARIABLE_CONST, (free, slot, value, function))
+                return
+            if self.variable(previous[0]):
+                other_free, other_slot = self.variable(previous[0])
+                program.fuse(2, BINARY_VARIABLE_VARIABLE, (free, slot, other_free, other_slot, function))
+                return
+        program.emit(BINARY, self.constant(function))
+
+    def compile_block(self, number):
+        """Emit the instructions of a control structure in the order the CSE machine executes them."""
+        program = self.program
+
+        # Nested conditionals are compiled with an explicit stack of tasks instead of recursion.
+        # A "block" task compiles a control structure from the given index down to its start.
+        # A "jump" task ends a then part: it emits the jump over the else part and points the
+        # conditional jump at the else part. A "patch" task points that jump past the else part.
+        tasks = [("block", number, len(self.control_structures[number]) - 1)]
+        while tasks:
+            task, first, second = tasks.pop()
+            if task == "block":
+                self.compile_symbols(first, second, tasks)
+            elif task == "jump":
+                second[0] = program.emit(JUMP)
+                program.patch(first, len(program.code))
+            else:
+                program.patch(first[0], len(program.code))
+
+    def compile_symbols(self, number, index, tasks):
+        """Compile symbols of a control structure until its start or the next conditional."""
+        program = self.program
+        structure = self.control_structures[number]
+
+        while index >= 0:
+            symbol = structure[index]
+            index -= 1
+
+            if type(symbol) == Constant:
+                program.emit(LOAD_CONST, self.constant(symbol.value))
+            elif type(symbol) == Variable:
+                program.emit(LOAD_LOCAL, symbol.slot)
+            elif type(symbol) == FreeVariable:
+                program.emit(LOAD_FREE, symbol.slot)
+            elif type(symbol) == Identifier:
+                program.emit(LOAD_NAME, self.name(symbol.name))
+            elif type(symbol) == Lambda:
+                program.emit(MAKE_CLOSURE, len(program.constants))
+                program.constants.append(symbol)
+                self.pending.append(symbol.number)
+            elif type(symbol) == Tau:
+                program.emit(MAKE_TUPLE, symbol.number)
+            elif symbol is Opcode.GAMMA:
+                self.emit_apply()
+            elif symbol in BINARY_OPERATORS:
+                self.emit_binary(BINARY_FUNCTIONS[symbol])
+            elif symbol in UNARY_OPERATORS:
+                program.emit(UNARY, self.constant(UNARY_FUNCTIONS[symbol]))
+
+            # The two deltas of a conditional precede the beta symbol and are inlined here.
+            # The then part is compiled first; it ends with a jump over the else part.
+            elif symbol is Opcode.BETA:
+                else_part = structure[index]
+                then_part = structure[index - 1]
+                index -= 2
+
+                jump_to_else = program.emit(JUMP_IF_FALSE)
+                jump_to_end = [None]
+                tasks.append(("block", number, index))
+                tasks.append(("patch", jump_to_end, None))
+                tasks.append(("block", else_part.number, len(self.control_structures[else_part.number]) - 1))
+                tasks.append(("jump", jump_to_else, jump_to_end))
+                tasks.append(("block", then_part.number, len(self.control_structures[then_part.number]) - 1))
+                return
+
+
+class VM:
+    """Executes a compiled program."""
+    def __init__(self, program, output=None, statistics=None):
+        self.program = program
+        self.print_present = False
+        self.output = output
+        self.new_frame = statistics.frame if statistics else Frame      # Frames are only counted with statistics
+
+    def run(self):
+        program = self.program
+        code = program.code
+        constants = program.constants
+        names = program.names
+        operands = program.operands
+        entries = program.entries
+
+        stack = []
+        frames = []                     # (return address, frame, pending argument) of each call
+        push = stack.append
+        pop = stack.pop
+        no_argument = object()
+        new_frame = self.new_frame
+        frame = new_frame((), ())       # The frame of the program binds no variables
+
+        # The following function makes a closure of a lambda in the current frame. A closure captures only
+        # the values of the free variables of its lambda; a recursive closure captures itself in place of
+        # the parameter of the lambda that binds its name.
+        def closure(template, values, captured, recursive=False):
+            temp = Lambda(template.number)
+            temp.bounded_variable = template.bounded_variable
+            temp.parameters = template.parameters
+            temp.arity = template.arity
+            temp.environment = tuple([(temp if recursive else values[capture.slot]) if type(capture) == Variable
+                                      else captured[capture.slot] for capture in template.captures])
+            return temp
+
+        # The following function applies a value to an argument and returns the next address.
+        def call(rator, rand, address, pending=no_argument):
+            nonlocal frame
+
+            if type(rator) == Lambda:
+                # A call followed by a return reuses the frame of the caller, so tail calls
+                # do not grow the frame stack.
+                if code[address] != RETURN or pending is not no_argument:
+                    frames.append((address, frame, pending))
+
+                # The values fill the slots of the parameters in order.
+                arity = rator.arity
+                if arity == 1:
+                    frame = new_frame((rand,), rator.environment)
+                elif type(rand) == Vector and rand.length == arity:
+                    frame = new_frame(tuple(rand.items[:arity]), rator.environment)
+                else:
+                    frame = new_frame(tuple([rand[i] for i in range(arity)]), rator.environment)
+                return entries[rator.number]
+
+            elif type(rator) == Vector:
+                push(rator[rand - 1])
+
+            elif type(rator) == Partial:
+                push(rator.function(rator.argument, rand))
+
+            # A lambda that binds the recursive name and only returns another lambda is bound at once to a
+            # closure of the inner lambda that captures itself, as in Rule 12 of the CSE machine.
+            elif rator == "Y*":
+                entry = entries[rand.number]
+                if code[entry] == MAKE_CLOSURE and code[entry + 2] == RETURN and rand.arity == 1:
+                    push(closure(constants[code[entry + 1]], (), rand.environment, True))
+                else:
+                    temp = Eta(rand.number)
+                    temp.bounded_variable = rand.bounded_variable
+                    temp.parameters = rand.parameters
+                    temp.arity = rand.arity
+                    temp.environment = rand.environment
+                    push(temp)
+
+            # The recursive function is obtained by applying its lambda to the eta,
+            # and the result is then applied to the argument when the call returns.
+            elif type(rator) == Eta:
+                temp = Lambda(rator.number)
+                temp.bounded_variable = rator.bounded_variable
+                temp.parameters = rator.parameters
+                temp.arity = rator.arity
+                temp.environment = rator.environment
+                return call(temp, rator, address, rand)
+
+            elif rator == "Print" or rator == "print":
+                self.print_present = True
+                push(print_value(rand, self.output))
+
+            elif rator == "Conc":
+                push(Partial(concatenate, rand))
+
+            elif rator in builtInFunctions:
+                push(BUILT_IN_FUNCTIONS[rator](rand))
+
+            else:
+                raise RPALError("Cannot apply: " + format_result(rator))
+            return address
+
+        def halt(operand, address):
+            return -1
+
+        def load_const(operand, address):
+            push(constants[operand])
+            return address
+
+        def load_name(operand, address):
+            raise RPALError("Undeclared Identifier: " + names[operand])
+
+        def make_closure(operand, address):
+            push(closure(constants[operand], frame.values, frame.captured))
+            return address
+
+        def make_tuple(operand, address):
+            push(Vector([pop() for _ in range(operand)]))
+            return address
+
+        def apply(operand, address):
+            rator = pop()
+            return call(rator, pop(), address)
+
+        def return_(operand, address):
+            nonlocal frame
+            address, frame, pending = frames.pop()
+            if pending is not no_argument:
+                return call(pop(), pending, address)
+            return address
+
+        def jump(operand, address):
+            return operand
+
+        def jump_if_false(operand, address):
+            return address if pop() else operand
+
+        def binary(operand, address):
+            rand_1 = pop()
+            push(constants[operand](rand_1, pop()))
+            return address
+
+        def unary(operand, address):
+            push(constants[operand](pop()))
+            return address
+
+        def load_local(operand, address):
+            push(frame.values[operand])
+            return address
+
+        def load_free(operand, address):
+            push(frame.captured[operand])
+            return address
+
+        def apply_variable(operand, address):
+            free, slot = operands[operand]
+            rator = frame.captured[slot] if free else frame.values[slot]
+            return call(rator, pop(), address)
+
+        def binary_variable_const(operand, address):
+            free, slot, value, function = operands[operand]
+            push(function(frame.captured[slot] if free else frame.values[slot], value))
+            return address
+
+        def binary_variable_variable(operand, address):
+            free, slot, other_free, other_slot, function = operands[operand]
+            push(function(frame.captured[slot] if free else frame.values[slot],
+                          frame.captured[other_slot] if other_free else frame.values[other_slot]))
+            return address
+
+        handlers = [halt, load_const, load_name, make_closure, make_tuple, apply,
+                    return_, jump, jump_if_false, binary, unary, load_local, load_free,
+                    apply_variable, binary_variable_const, binary_variable_variable]
+
+        address = 0
+        while address >= 0:
+            address = handlers[code[address]](code[address + 1], address + 2)
+
+        return stack[-1] if stack else None
+
+
+# The following function is called from the myrpal.py file when the VM engine is selected.
+def get_result(pipeline, output=None, statistics=None):
+    program = Compiler(pipeline.control_structures).compile()
+
+    machine = VM(program, output, statistics)
+    result = machine.run()
+
+    if machine.print_present:
+        print(file=output)
+    return result